@@ -0,0 +1,80 @@
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import ClaimsUser
+from accounts.tokens import aget_token_version, cache_token_version, get_token_version
+
+TOKEN_VERSION_CLAIM = "tv"
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the user from the token's claims instead of
+    loading it from the database on every request.
+    - The token's version claim is checked against the user's current token
+      version, read from the cache.
+    - The database is only hit when that version is not cached, or for tokens
+      issued without the claims.
+    """
+
+    def get_user(self, validated_token):
+        claims = self.get_claims(validated_token)
+        if claims is None:
+            return super().get_user(validated_token)
+
+        current_version = get_token_version(claims[0])
+        if current_version is None:
+            return self.load_user(validated_token, claims)
+        return self.user_from_claims(claims, current_version)
+
+    async def aauthenticate(self, request):
+        """Async variant of authenticate(), for async views."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        claims = self.get_claims(validated_token)
+        current_version = await aget_token_version(claims[0]) if claims else None
+        if current_version is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        else:
+            user = self.user_from_claims(claims, current_version)
+        return user, validated_token
+
+    @staticmethod
+    def get_claims(validated_token):
+        """Return (user id, email, is_active, token version), or None for tokens without the claims."""
+        try:
+            return (
+                validated_token[api_settings.USER_ID_CLAIM],
+                validated_token["email"],
+                validated_token["is_active"],
+                validated_token[TOKEN_VERSION_CLAIM],
+            )
+        except KeyError:
+            return None
+
+    def load_user(self, validated_token, claims):
+        user = super().get_user(validated_token)
+        cache_token_version(user.pk, user.token_version)
+        self.check_version(claims[3], user.token_version)
+        return user
+
+    def user_from_claims(self, claims, current_version):
+        user_id, email, is_active, token_version = claims
+        self.check_version(token_version, current_version)
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser.from_claims(user_id, email, is_active, token_version)
+
+    @staticmethod
+    def check_version(token_version, current_version):
+        if token_version != current_version:
+            raise InvalidToken(_("Token has been revoked"))
@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+GENERATION_KEY = "accounts:blacklist:generation"
+# Ids missing from a sync may belong to transactions that commit out of id order;
+# they are re-checked for this long (seconds)
+GAP_TTL = 300
+GAP_SCAN = 10_000
+
+
+def _blacklist_cache():
+    return caches[getattr(settings, "TOKEN_VERSION_CACHE_ALIAS", "default")]
+
+
+class JTIBlacklist:
+    """
+    In-memory set of blacklisted JTIs, so checking a refresh token does not
+    query BlacklistedToken.
+    - Every blacklist write changes a generation key in the shared cache; a
+      changed generation pulls the rows added since the last sync, by id.
+    - Without a generation change the set is still re-synced every
+      TOKEN_BLACKLIST_SYNC_INTERVAL seconds.
+    - Expired tokens are dropped, since they fail verification anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._jtis = {}  # jti -> expiry timestamp
+        self._last_id = 0
+        self._gaps = {}  # id -> monotonic deadline
+        self._generation = None
+        self._synced_at = None
+
+    def contains(self, jti):
+        generation = _blacklist_cache().get(GENERATION_KEY)
+        if generation is None:
+            _blacklist_cache().add(GENERATION_KEY, uuid.uuid4().hex, None)
+        if generation is None or generation != self._generation or self._sync_due():
+            with self._lock:
+                self._sync()
+                self._generation = generation
+        return jti in self._jtis
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._jtis[jti] = exp
+
+    def _sync_due(self):
+        interval = getattr(settings, "TOKEN_BLACKLIST_SYNC_INTERVAL", 10)
+        return self._synced_at is None or time.monotonic() - self._synced_at >= interval
+
+    def _sync(self):
+        now = time.monotonic()
+        self._gaps = {pk: deadline for pk, deadline in self._gaps.items() if deadline > now}
+
+        rows = BlacklistedToken.objects.filter(Q(id__gt=self._last_id) | Q(id__in=list(self._gaps)))
+        seen = set()
+        for pk, jti, expires_at in rows.values_list("id", "token__jti", "token__expires_at"):
+            seen.add(pk)
+            self._jtis[jti] = expires_at.timestamp()
+
+        last_id = max(seen, default=self._last_id)
+        if last_id > self._last_id:
+            scan_from = max(self._last_id, last_id - GAP_SCAN) + 1
+            for pk in set(range(scan_from, last_id)) - seen:
+                self._gaps[pk] = now + GAP_TTL
+            self._last_id = last_id
+        for pk in seen:
+            self._gaps.pop(pk, None)
+
+        cutoff = time.time()
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > cutoff}
+        self._synced_at = now
+
+
+jti_blacklist = JTIBlacklist()
+
+
+def bump_generation():
+    _blacklist_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """RefreshToken checked against the in-memory blacklist instead of the database."""
+
+    def check_blacklist(self):
+        if jti_blacklist.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        jti_blacklist.add(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        transaction.on_commit(bump_generation)
+        return result
@@ -0,0 +1,101 @@
+"""
+Password hashers whose cost is tuned per environment from settings.PASSWORD_HASHING.
+
+Algorithm names match Django's own hashers, so existing hashes keep
+verifying, and Django re-hashes a password on login once its cost
+parameters change.
+
+Under ASGI every request's sync code runs on its own thread, so a burst of
+logins would hash on as many threads at once. Once enable_offload() has been
+called (see asgi.py), hashing runs on a bounded pool instead and excess
+requests queue for it.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_local = threading.local()
+
+
+def enable_offload(max_workers):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hashing")
+
+
+def disable_offload():
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _in_pool(func, args, kwargs):
+    _local.in_pool = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.in_pool = False
+
+
+def run_hashing(func, *args, **kwargs):
+    """Run func on the hashing pool when offload is enabled, inline otherwise."""
+    # verify() calls encode() itself; nested calls stay on the pool thread
+    if _executor is None or getattr(_local, "in_pool", False):
+        return func(*args, **kwargs)
+    return _executor.submit(_in_pool, func, args, kwargs).result()
+
+
+def _cost(name, default):
+    return getattr(settings, "PASSWORD_HASHING", {}).get(name, default)
+
+
+class OffloadedHashingMixin:
+    def encode(self, password, salt, *args, **kwargs):
+        return run_hashing(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run_hashing(super().verify, password, encoded)
+
+
+class PBKDF2PasswordHasher(OffloadedHashingMixin, hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _cost("PBKDF2_ITERATIONS", hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(OffloadedHashingMixin, hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _cost("SCRYPT_WORK_FACTOR", hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return _cost("SCRYPT_BLOCK_SIZE", hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return _cost("SCRYPT_PARALLELISM", hashers.ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        return _cost("SCRYPT_MAXMEM", hashers.ScryptPasswordHasher.maxmem)
+
+
+class Argon2PasswordHasher(OffloadedHashingMixin, hashers.Argon2PasswordHasher):
+    """Only listed in PASSWORD_HASHERS when argon2-cffi is installed."""
+
+    @property
+    def time_cost(self):
+        return _cost("ARGON2_TIME_COST", hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _cost("ARGON2_MEMORY_COST", hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _cost("ARGON2_PARALLELISM", hashers.Argon2PasswordHasher.parallelism)
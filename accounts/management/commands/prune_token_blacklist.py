@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted tokens, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        deleted = 0
+        last_pk = 0
+
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(pk__gt=last_pk, expires_at__lte=now)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+
+            # Short transactions keep logouts and refreshes from waiting on the prune
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+
+            deleted += len(ids)
+            self.stdout.write(f"Deleted {deleted} expired tokens.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {deleted} expired tokens deleted."))
@@ -1,13 +1,84 @@
 import uuid
+from django.contrib.auth.hashers import acheck_password, check_password
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from accounts.tokens import publish_token_version
+
 class CustomUser(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
+    # Carried in JWTs; bumped on password change or deactivation to revoke them
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'  # Use email to login
     REQUIRED_FIELDS = ['username']  # Username required in addition to email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_active = instance.__dict__.get("is_active")
+        return instance
+
+    def set_password(self, raw_password, revoke_tokens=True):
+        super().set_password(raw_password)
+        if revoke_tokens and not self._state.adding:
+            self.token_version += 1
+
+    def _rehash_password(self, raw_password):
+        # Same password under a new hasher or cost: tokens stay valid
+        self.set_password(raw_password, revoke_tokens=False)
+        self._password = None
+
+    def check_password(self, raw_password):
+        """Like Django's, but the re-hash on login after a hashing change does not revoke tokens."""
+        def setter(raw_password):
+            self._rehash_password(raw_password)
+            self.save(update_fields=["password"])
+
+        return check_password(raw_password, self.password, setter)
+
+    async def acheck_password(self, raw_password):
+        async def setter(raw_password):
+            self._rehash_password(raw_password)
+            await self.asave(update_fields=["password"])
+
+        return await acheck_password(raw_password, self.password, setter)
+
+    def save(self, *args, **kwargs):
+        if getattr(self, "_loaded_is_active", False) and not self.is_active:
+            self.token_version += 1
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"password", "is_active"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "token_version"}
+
+        super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+
+        publish_token_version(self.pk, self.token_version)
+
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class ClaimsUser(CustomUser):
+    """
+    A user rebuilt from access token claims (id, email, is_active, token
+    version) without a database lookup. Only those fields are populated, so
+    it cannot be saved or deleted; load the CustomUser for anything else.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, email, is_active, token_version):
+        user = cls(id=cls._meta.pk.to_python(user_id), email=email, is_active=is_active, token_version=token_version)
+        user._state.adding = False
+        return user
+
+    def save(self, *args, **kwargs):
+        raise TypeError("ClaimsUser is built from token claims and cannot be saved.")
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("ClaimsUser is built from token claims and cannot be deleted.")
@@ -1,5 +1,10 @@
+from accounts.authentication import TOKEN_VERSION_CLAIM
+from accounts.blacklist import CachedBlacklistRefreshToken
 from accounts.models import CustomUser
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 
 # User Registration Serializer
@@ -21,4 +26,41 @@ class RegisterSerializer(serializers.ModelSerializer):
 class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'username', 'first_name', 'last_name']
\ No newline at end of file
+        fields = ['id', 'email', 'username', 'first_name', 'last_name']
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the claims ClaimsJWTAuthentication needs to rebuild the user without a
+    database lookup. Access tokens minted from the refresh token inherit them.
+    """
+
+    token_class = CachedBlacklistRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["email"] = user.email
+        token["is_active"] = user.is_active
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Rejects refresh tokens issued before the user's last password change or
+    deactivation, and checks the blacklist in memory.
+    """
+
+    token_class = CachedBlacklistRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if TOKEN_VERSION_CLAIM in refresh:
+            user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+            current = CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(
+                "token_version", flat=True
+            ).first()
+            if current is not None and current != refresh[TOKEN_VERSION_CLAIM]:
+                raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
@@ -1,7 +1,25 @@
+import runpy
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework import status
 from django.urls import reverse
+from accounts.blacklist import bump_generation, jti_blacklist
+from accounts.hashers import disable_offload, enable_offload
 from accounts.models import CustomUser
+from core.models import Project, ProjectUserRole
 
 
 class AccountsAuthTestCase(APITestCase):
@@ -57,3 +75,225 @@ class AccountsAuthTestCase(APITestCase):
 
 
 
+
+
+class ClaimsJWTAuthenticationTest(APITestCase):
+    """
+    Access tokens carry the user's claims and token version:
+    - authenticated requests skip the user lookup once the version is cached
+    - password changes and deactivation revoke tokens issued before them
+    """
+
+    def setUp(self):
+        cache = caches[settings.TOKEN_VERSION_CACHE_ALIAS]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.password = 'strongpassword123'
+        self.user = CustomUser.objects.create_user(
+            email='claims@example.com', password=self.password, username='claims'
+        )
+        self.profile_url = reverse('profile')
+
+    def login(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': self.user.email, 'password': self.password},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_token_carries_claims(self):
+        access = AccessToken(self.login()['access'])
+        self.assertEqual(access['email'], self.user.email)
+        self.assertTrue(access['is_active'])
+        self.assertEqual(access['tv'], self.user.token_version)
+
+    def test_cached_version_skips_user_lookup(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        # Cold cache: user lookup for authentication, then the profile itself
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'claims')
+
+    def test_user_from_claims_can_own_projects(self):
+        project = Project.objects.create(name='Existing', owner=self.user)
+        ProjectUserRole.objects.create(user=self.user, project=project, role='owner')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        self.client.get(self.profile_url)
+        response = self.client.post(reverse('projects-list'), {'name': 'Claims'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Project.objects.get(name='Claims').owner_id, self.user.pk)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_200_OK)
+
+        self.user.set_password('anotherpassword456')
+        self.user.save()
+
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.password = 'anotherpassword456'
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_200_OK)
+
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+
+        self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenBlacklistTest(APITestCase):
+    """
+    Logged out refresh tokens are rejected from the in-memory blacklist,
+    and expired tokens are pruned from the blacklist tables.
+    """
+
+    def setUp(self):
+        cache = caches[settings.TOKEN_VERSION_CACHE_ALIAS]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        jti_blacklist.reset()
+        self.addCleanup(jti_blacklist.reset)
+        self.user = CustomUser.objects.create_user(
+            email='blacklist@example.com', password='strongpassword123', username='blacklist'
+        )
+
+    def login(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'blacklist@example.com', 'password': 'strongpassword123'},
+            format='json',
+        )
+        return response.data['refresh']
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': token}, format='json')
+
+    def test_logout_blacklists_refresh_token(self):
+        logged_out, other = self.login(), self.login()
+        self.assertEqual(self.refresh(other).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('auth_logout'), {'refresh': logged_out}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+
+        self.assertEqual(self.refresh(logged_out).status_code, status.HTTP_401_UNAUTHORIZED)
+        # Token version and user checks only; the blacklist is answered from memory
+        with self.assertNumQueries(2):
+            self.assertEqual(self.refresh(other).status_code, status.HTTP_200_OK)
+
+    def test_blacklist_written_elsewhere_is_picked_up(self):
+        token = self.login()
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_200_OK)
+
+        outstanding = OutstandingToken.objects.get(jti=RefreshToken(token)['jti'])
+        BlacklistedToken.objects.create(token=outstanding)
+        bump_generation()
+
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_deletes_expired_tokens_only(self):
+        live = OutstandingToken.objects.get(jti=RefreshToken(self.login())['jti'])
+        past = timezone.now() - timedelta(days=1)
+        for i in range(5):
+            expired = OutstandingToken.objects.create(
+                user=self.user, jti=f'expired-{i}', token='x', created_at=past, expires_at=past
+            )
+            BlacklistedToken.objects.create(token=expired)
+
+        out = StringIO()
+        call_command('prune_token_blacklist', batch_size=2, stdout=out)
+
+        self.assertIn('Done: 5 expired tokens deleted.', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('pk', flat=True)), [live.pk])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(
+    PASSWORD_HASHERS=['accounts.hashers.PBKDF2PasswordHasher', 'accounts.hashers.ScryptPasswordHasher'],
+    PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1000, 'SCRYPT_WORK_FACTOR': 2 ** 10},
+)
+class PasswordHashingTest(APITestCase):
+    """
+    Hasher cost comes from settings.PASSWORD_HASHING:
+    - passwords are re-hashed on login when the cost changes
+    - with offload enabled, hashing runs on the bounded pool
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='hashing@example.com', password='strongpassword123', username='hashing'
+        )
+
+    def login(self):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'email': 'hashing@example.com', 'password': 'strongpassword123'},
+            format='json',
+        )
+
+    def test_cost_comes_from_settings(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_rehashes_when_cost_changes(self):
+        with self.settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_rehash_on_login_keeps_tokens_valid(self):
+        """A re-hash is not a password change: tokens issued before it still work"""
+        tokens = self.login().data
+        with self.settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertEqual(self.user.token_version, 0)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+        self.client.credentials()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_existing_hashes_verify_after_switching_hasher(self):
+        with self.settings(PASSWORD_HASHERS=['accounts.hashers.ScryptPasswordHasher',
+                                             'accounts.hashers.PBKDF2PasswordHasher']):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$1024$'))
+
+    def test_unknown_hasher_is_a_configuration_error(self):
+        """A mistyped PASSWORD_HASHER fails at startup rather than picking another hasher"""
+        with mock.patch.dict('os.environ', {'PASSWORD_HASHER': 'argon3'}), \
+                self.assertRaisesMessage(ImproperlyConfigured, "PASSWORD_HASHER='argon3' is not available"):
+            runpy.run_module('django_project_management_app.settings')
+
+    def test_offload_hashes_on_pool(self):
+        threads = []
+        verify = hashers.PBKDF2PasswordHasher.verify
+
+        def record_thread(hasher, password, encoded):
+            threads.append(threading.current_thread().name)
+            return verify(hasher, password, encoded)
+
+        enable_offload(1)
+        self.addCleanup(disable_offload)
+        with mock.patch.object(hashers.PBKDF2PasswordHasher, 'verify', record_thread):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith('password-hashing') for name in threads))
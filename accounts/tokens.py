@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def _token_cache():
+    return caches[getattr(settings, "TOKEN_VERSION_CACHE_ALIAS", "default")]
+
+
+def _token_version_key(user_id):
+    return f"accounts:token_version:{user_id}"
+
+
+def get_token_version(user_id):
+    """Return the user's current token version from the cache, or None if it is not cached."""
+    return _token_cache().get(_token_version_key(user_id))
+
+
+async def aget_token_version(user_id):
+    return await _token_cache().aget(_token_version_key(user_id))
+
+
+def cache_token_version(user_id, version):
+    _token_cache().set(_token_version_key(user_id), version, getattr(settings, "TOKEN_VERSION_CACHE_TIMEOUT", 300))
+
+
+def publish_token_version(user_id, version):
+    """
+    Make a new token version visible to every request.
+    The cached version is dropped right away and set again once the
+    transaction commits, so a reader that cached the old row in between is
+    overwritten.
+    """
+    _token_cache().delete(_token_version_key(user_id))
+    transaction.on_commit(lambda: cache_token_version(user_id, version))
@@ -1,7 +1,7 @@
 from accounts.models import CustomUser
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.blacklist import CachedBlacklistRefreshToken
 from accounts.serializers import RegisterSerializer, CustomUserSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -35,7 +35,8 @@ class ProfileView(generics.RetrieveAPIView):
 
     def get_object(self):
         try:
-            return self.request.user
+            # request.user only carries the token claims; load the full profile
+            return CustomUser.objects.get(pk=self.request.user.pk)
         except Exception as e:
             return custom_response(ERROR_FETCHING_PROFILE, str(e), status.HTTP_400_BAD_REQUEST)
 
@@ -60,7 +61,7 @@ class LogoutView(APIView):
             return custom_response(ERROR_INVALID_REFRESH_TOKEN, [], status_code=status.HTTP_400_BAD_REQUEST)
 
         try:
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
             return custom_response(SUCCESS_LOGOUT, [], status_code=status.HTTP_205_RESET_CONTENT)
         except Exception:
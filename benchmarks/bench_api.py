@@ -0,0 +1,261 @@
+"""
+Every route of core/urls.py and accounts/urls.py, driven in-process against
+a test database filled by the seed_data command.
+
+    python -m benchmarks.bench_api --users 1000 --projects 500 --comments 20000 --output before.json
+    python -m benchmarks.bench_api --users 1000 --projects 500 --comments 20000 --compare before.json
+
+Requests run one at a time as the owner of the busiest project, with a real
+access token. Each route reports p50/p99 latency, queries per request and
+requests per second; --compare adds each number's ratio to an earlier report.
+Routes that create or delete get a fresh object per request, prepared
+outside the timing.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import BASE_DIR, report, setup_django, test_database
+
+# Routes that are not benchmarked, and why
+SKIPPED = {"async-projects-events": "a stream that stays open"}
+# Routes that hash a password take a share of --repeat
+HASHING_ROUTES = {"auth_register", "token_obtain_pair"}
+
+
+class Fixture:
+    """The benchmark user, the busiest project and a sample of its rows."""
+
+    def __init__(self, password):
+        from accounts.serializers import ClaimsTokenObtainPairSerializer
+        from core.models import Comment, Project, ProjectUserRole
+
+        self.password = password
+        self.project = Project.objects.order_by("-comment_count").first()
+        self.user = self.project.owner
+        self.comment = Comment.objects.filter(project=self.project).first()
+        self.role = ProjectUserRole.objects.filter(project=self.project).exclude(user=self.user).first()
+        self.project_ids = [str(pk) for pk in Project.objects.values_list("pk", flat=True)[:200]]
+        self.token = ClaimsTokenObtainPairSerializer.get_token(self.user)
+
+    def refresh_token(self):
+        from accounts.serializers import ClaimsTokenObtainPairSerializer
+        return str(ClaimsTokenObtainPairSerializer.get_token(self.user))
+
+    def new_user(self, name):
+        from accounts.models import CustomUser
+        return CustomUser.objects.create(username=f"bench_{name}", email=f"bench_{name}@example.com")
+
+    def new_project(self):
+        from core.models import Project, ProjectUserRole
+        project = Project.objects.create(name="Disposable", owner=self.user, member_count=1)
+        ProjectUserRole.objects.create(user=self.user, project=project, role="owner")
+        return project
+
+    def new_comment(self):
+        from core.models import Comment
+        return Comment.objects.create(project=self.project, author=self.user, text="Disposable")
+
+    def new_role(self, name):
+        from core.models import ProjectUserRole
+        return ProjectUserRole.objects.create(user=self.new_user(name), project=self.project, role="reader")
+
+
+def routes():
+    """(url name, label, method, prepare) where prepare(fixture, i) returns (path, body, content type)."""
+    json_type = "application/json"
+    return [
+        ("api-root", "api-root", "get", lambda f, i: ("/api/", None, None)),
+        ("projects-list", "projects-list", "get", lambda f, i: ("/api/projects/", None, None)),
+        ("projects-list", "projects-create", "post", lambda f, i: (
+            "/api/projects/", {"name": f"Bench {i}", "description": "Benchmark"}, json_type)),
+        ("projects-detail", "projects-retrieve", "get", lambda f, i: (f"/api/projects/{f.project.pk}/", None, None)),
+        ("projects-detail", "projects-update", "put", lambda f, i: (
+            f"/api/projects/{f.project.pk}/", {"name": f.project.name, "description": f"Edit {i}"}, json_type)),
+        ("projects-detail", "projects-destroy", "delete", lambda f, i: (
+            f"/api/projects/{f.new_project().pk}/", None, None)),
+        ("projects-access", "projects-access", "post", lambda f, i: (
+            "/api/projects/access/", {"projects": f.project_ids}, json_type)),
+        ("projects-export-comments", "projects-export-comments", "get", lambda f, i: (
+            f"/api/projects/{f.project.pk}/comments/export/", None, None)),
+        ("projects-import-comments", "projects-import-comments", "post", lambda f, i: (
+            f"/api/projects/{f.project.pk}/comments/import/",
+            "".join(json.dumps({"text": f"Imported {i}.{n}"}) + "\n" for n in range(100)), "application/x-ndjson")),
+        ("roles-list", "roles-list", "get", lambda f, i: ("/api/roles/", None, None)),
+        ("roles-list", "roles-create", "post", lambda f, i: ("/api/roles/", {
+            "project": str(f.project.pk), "user": str(f.new_user(f"role_{i}").pk), "role": "reader"}, json_type)),
+        ("roles-detail", "roles-retrieve", "get", lambda f, i: (f"/api/roles/{f.role.pk}/", None, None)),
+        ("roles-detail", "roles-destroy", "delete", lambda f, i: (
+            f"/api/roles/{f.new_role(f'removed_{i}').pk}/", None, None)),
+        ("roles-bulk", "roles-bulk", "post", lambda f, i: ("/api/roles/bulk/", {
+            "project": str(f.project.pk),
+            "roles": [{"user": str(f.new_user(f"bulk_{i}_{n}").pk), "role": "reader"} for n in range(20)],
+        }, json_type)),
+        ("comments-list", "comments-list", "get", lambda f, i: ("/api/comments/", None, None)),
+        ("comments-list", "comments-list-project", "get", lambda f, i: (
+            f"/api/comments/?project={f.project.pk}", None, None)),
+        ("comments-list", "comments-create", "post", lambda f, i: (
+            "/api/comments/", {"project": str(f.project.pk), "text": f"Bench {i}"}, json_type)),
+        ("comments-detail", "comments-retrieve", "get", lambda f, i: (f"/api/comments/{f.comment.pk}/", None, None)),
+        ("comments-detail", "comments-update", "patch", lambda f, i: (
+            f"/api/comments/{f.comment.pk}/", {"text": f"Edit {i}"}, json_type)),
+        ("comments-detail", "comments-destroy", "delete", lambda f, i: (
+            f"/api/comments/{f.new_comment().pk}/", None, None)),
+        ("search", "search", "get", lambda f, i: ("/api/search/?q=launch", None, None)),
+        ("changes", "changes", "get", lambda f, i: ("/api/changes/?since=0", None, None)),
+        ("async-projects-list", "async-projects-list", "get", lambda f, i: ("/api/async/projects/", None, None)),
+        ("async-projects-list", "async-projects-create", "post", lambda f, i: (
+            "/api/async/projects/", {"name": f"Async bench {i}"}, json_type)),
+        ("async-projects-detail", "async-projects-retrieve", "get", lambda f, i: (
+            f"/api/async/projects/{f.project.pk}/", None, None)),
+        ("async-comments-list", "async-comments-list", "get", lambda f, i: ("/api/async/comments/", None, None)),
+        ("async-comments-list", "async-comments-create", "post", lambda f, i: (
+            "/api/async/comments/", {"project": str(f.project.pk), "text": f"Async bench {i}"}, json_type)),
+        ("async-comments-detail", "async-comments-retrieve", "get", lambda f, i: (
+            f"/api/async/comments/{f.comment.pk}/", None, None)),
+        ("async-roles-list", "async-roles-list", "get", lambda f, i: ("/api/async/roles/", None, None)),
+        ("async-roles-list", "async-roles-create", "post", lambda f, i: ("/api/async/roles/", {
+            "project": str(f.project.pk), "user": str(f.new_user(f"async_{i}").pk), "role": "reader"}, json_type)),
+        ("async-roles-detail", "async-roles-retrieve", "get", lambda f, i: (
+            f"/api/async/roles/{f.role.pk}/", None, None)),
+        ("auth_register", "auth_register", "post", lambda f, i: ("/api/accounts/register/", {
+            "username": f"register_{i}", "email": f"register_{i}@example.com", "password": "password123"}, json_type)),
+        ("token_obtain_pair", "token_obtain_pair", "post", lambda f, i: (
+            "/api/accounts/login/", {"email": f.user.email, "password": f.password}, json_type)),
+        ("profile", "profile", "get", lambda f, i: ("/api/accounts/profile/", None, None)),
+        ("token_refresh", "token_refresh", "post", lambda f, i: (
+            "/api/accounts/token/refresh/", {"refresh": f.refresh_token()}, json_type)),
+        ("auth_logout", "auth_logout", "post", lambda f, i: (
+            "/api/accounts/logout/", {"refresh": f.refresh_token()}, json_type)),
+    ]
+
+
+def url_names():
+    """Names of the routes in core/urls.py and accounts/urls.py."""
+    from django.urls import URLResolver
+    import accounts.urls
+    import core.urls
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+    return set(walk(core.urls.urlpatterns)) | set(walk(accounts.urls.urlpatterns))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def bench(client, fixture, method, prepare, repeat):
+    from django.db import connection
+
+    timings, counter = [], QueryCounter()
+    for i in range(repeat + 1):  # the first request warms up
+        path, body, content_type = prepare(fixture, i)
+        kwargs = {}
+        if body is not None:
+            kwargs = {"data": body if isinstance(body, str) else json.dumps(body), "content_type": content_type}
+        counter.count = 0
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        assert response.status_code < 400, (method, path, response.status_code, response.content[:200])
+        if i:
+            timings.append(elapsed)
+            queries = counter.count
+
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 3),
+        "queries": queries,
+        "requests_per_second": round(len(timings) / sum(timings), 1),
+    }
+
+
+def compare(results, baseline):
+    """Add each number's ratio to the baseline report (below 1 is fewer/faster, except requests_per_second)."""
+    for label, numbers in results.items():
+        before = baseline.get("routes", {}).get(label)
+        if before:
+            numbers["vs_baseline"] = {
+                key: round(value / before[key], 3) if before.get(key) else None for key, value in numbers.items()
+            }
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--only", nargs="*", help="Benchmark only these route labels.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--compare", help="A previous report to compare with.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.test import Client
+
+    password = "password123"
+    with test_database():
+        call_command("seed_data", users=args.users, projects=args.projects, members=args.members,
+                     comments=args.comments, seed=args.seed, password=password, verbosity=0, stdout=sys.stderr)
+        fixture = Fixture(password)
+        client = Client(headers={"Authorization": f"Bearer {fixture.token.access_token}"})
+
+        selected = routes()
+        uncovered = url_names() - {name for name, *_ in selected} - set(SKIPPED)
+        if uncovered:
+            print(f"Routes without a benchmark: {', '.join(sorted(uncovered))}", file=sys.stderr)
+        if args.only:
+            selected = [route for route in selected if route[1] in args.only]
+
+        results = {}
+        for name, label, method, prepare in selected:
+            repeat = max(3, args.repeat // 10) if name in HASHING_ROUTES else args.repeat
+            results[label] = bench(client, fixture, method, prepare, repeat)
+            print(f"{label}: {results[label]['p50_ms']} ms", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
+    output = {
+        "commit": commit(),
+        "dataset": {key: getattr(args, key) for key in ("users", "projects", "members", "comments", "seed")},
+        "repeat": args.repeat,
+        "skipped": SKIPPED,
+        "routes": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+    report(output)
+
+
+if __name__ == "__main__":
+    main()
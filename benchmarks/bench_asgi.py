@@ -0,0 +1,144 @@
+"""
+Load test comparing the sync viewsets under WSGI with the async views under ASGI.
+
+In-process (default): the WSGI handler is driven from --concurrency threads,
+the ASGI handler from --concurrency asyncio tasks.
+
+    python -m benchmarks.bench_asgi --requests 500 --concurrency 32
+
+Against running servers, e.g. `gunicorn django_project_management_app.wsgi`
+and `uvicorn django_project_management_app.asgi:application --port 8001`,
+with an access token from /api/accounts/login/:
+
+    python -m benchmarks.bench_asgi --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001 --token ...
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import report, setup_django, test_database
+
+ROUTES = [("/api/projects/", "/api/async/projects/"), ("/api/comments/", "/api/async/comments/")]
+
+
+def seed(projects, comments_per_project):
+    from django.contrib.auth.hashers import make_password
+    from accounts.models import CustomUser
+    from core.models import Comment, Project, ProjectUserRole
+
+    user = CustomUser.objects.create(username="member", email="member@example.com", password=make_password(None))
+    created = Project.objects.bulk_create([Project(name=f"Project {i}", owner=user) for i in range(projects)])
+    ProjectUserRole.objects.bulk_create([ProjectUserRole(user=user, project=p, role="owner") for p in created])
+    Comment.objects.bulk_create([
+        Comment(project=p, author=user, text=f"Comment {i}") for p in created for i in range(comments_per_project)
+    ], batch_size=1000)
+    return user
+
+
+def summarize(timings, elapsed):
+    timings.sort()
+    return {
+        "requests_per_second": round(len(timings) / elapsed, 1),
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+    }
+
+
+def run_threads(get, path, requests, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        status_code = get(path)
+        assert status_code == 200, (path, status_code)
+        return (time.perf_counter() - start) * 1000
+
+    get(path)  # warm up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(one, range(requests)))
+    return summarize(timings, time.perf_counter() - start)
+
+
+async def run_tasks(get, path, requests, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            start = time.perf_counter()
+            status_code = await get(path)
+            assert status_code == 200, (path, status_code)
+            return (time.perf_counter() - start) * 1000
+
+    await get(path)  # warm up
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(one() for _ in range(requests)))
+    return summarize(list(timings), time.perf_counter() - start)
+
+
+def in_process(args):
+    from django.test import AsyncClient, Client
+    from accounts.serializers import ClaimsTokenObtainPairSerializer
+
+    with test_database():
+        user = seed(args.projects, args.comments)
+        headers = {"Authorization": f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}"}
+        client, async_client = Client(), AsyncClient()
+
+        def sync_get(path):
+            return client.get(path, headers=headers).status_code
+
+        async def async_get(path):
+            return (await async_client.get(path, headers=headers)).status_code
+
+        results = {}
+        for sync_path, async_path in ROUTES:
+            results[sync_path] = {
+                "wsgi": run_threads(sync_get, sync_path, args.requests, args.concurrency),
+                "asgi": asyncio.run(run_tasks(async_get, async_path, args.requests, args.concurrency)),
+            }
+        return results
+
+
+def over_http(args):
+    import requests
+
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {args.token}"
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def get(url):
+        return session.get(url).status_code
+
+    results = {}
+    for sync_path, async_path in ROUTES:
+        results[sync_path] = {
+            "wsgi": run_threads(get, args.wsgi_url + sync_path, args.requests, args.concurrency),
+            "asgi": run_threads(get, args.asgi_url + async_path, args.requests, args.concurrency),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=20, help="comments per project")
+    parser.add_argument("--wsgi-url")
+    parser.add_argument("--asgi-url")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+
+    if args.wsgi_url or args.asgi_url:
+        if not (args.wsgi_url and args.asgi_url and args.token):
+            parser.error("--wsgi-url, --asgi-url and --token go together")
+        results = over_http(args)
+    else:
+        setup_django()
+        results = in_process(args)
+
+    report({"requests": args.requests, "concurrency": args.concurrency, "routes": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Concurrent comment writes against a file-backed SQLite database, with the
+configured database profile or the old defaults (--legacy: rollback journal,
+deferred transactions, 5s busy timeout).
+
+    python -m benchmarks.bench_concurrent_writes --threads 16 --comments 25
+    python -m benchmarks.bench_concurrent_writes --threads 16 --comments 25 --legacy
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.harness import report, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--comments", type=int, default=25, help="comments per thread")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.sqlite3":
+        parser.error("this benchmark needs the sqlite database profile")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = settings.DATABASES["default"]
+        database["TEST"]["NAME"] = str(Path(tmp) / "bench.sqlite3")
+        if args.legacy:
+            database["OPTIONS"] = {}
+        run(args)
+        connection.close()
+
+
+def run(args):
+    from django.db import connection
+    from django.test import Client
+    from accounts.models import CustomUser
+    from accounts.serializers import ClaimsTokenObtainPairSerializer
+    from core.models import Project, ProjectUserRole
+
+    with test_database():
+        user = CustomUser.objects.create_user(username="member", email="member@example.com", password=None)
+        project = Project.objects.create(name="Benchmark", owner=user)
+        ProjectUserRole.objects.create(user=user, project=project, role="owner")
+        headers = {"Authorization": f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}"}
+
+        def write(thread):
+            client, failures = Client(), []
+            for i in range(args.comments):
+                try:
+                    response = client.post("/api/comments/", {"project": str(project.pk), "text": f"{thread}-{i}"},
+                                           content_type="application/json", headers=headers)
+                    if response.status_code != 201:
+                        failures.append(response.status_code)
+                except Exception as exc:
+                    failures.append(type(exc).__name__ + ": " + str(exc))
+            connection.close()
+            return failures
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            failures = [failure for result in pool.map(write, range(args.threads)) for failure in result]
+        elapsed = time.perf_counter() - start
+        project.refresh_from_db()
+
+        attempted = args.threads * args.comments
+        report({
+            "profile": "legacy" if args.legacy else "configured",
+            "attempted": attempted,
+            "failed": len(failures),
+            "failure_samples": sorted(set(map(str, failures)))[:5],
+            "comment_count": project.comment_count,
+            "writes_per_second": round((attempted - len(failures)) / elapsed, 1),
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Login throughput for the configured password hasher and cost.
+
+    python -m benchmarks.bench_login --hasher scrypt --logins 40 --concurrency 8
+    python -m benchmarks.bench_login --hasher pbkdf2 --pbkdf2-iterations 600000 --offload
+
+--offload runs hashing on the bounded pool used under ASGI, sized by
+PASSWORD_HASHING_WORKERS.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import report, setup_django, test_database
+
+PASSWORD = "benchmark-password-123"
+HASHERS = {
+    "argon2": "accounts.hashers.Argon2PasswordHasher",
+    "scrypt": "accounts.hashers.ScryptPasswordHasher",
+    "pbkdf2": "accounts.hashers.PBKDF2PasswordHasher",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hasher", choices=sorted(HASHERS), default="pbkdf2")
+    parser.add_argument("--pbkdf2-iterations", type=int)
+    parser.add_argument("--scrypt-work-factor", type=int)
+    parser.add_argument("--argon2-time-cost", type=int)
+    parser.add_argument("--argon2-memory-cost", type=int)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--offload", action="store_true")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import Client, override_settings
+    from accounts import hashers
+    from accounts.models import CustomUser
+
+    costs = dict(settings.PASSWORD_HASHING)
+    for name, value in [("PBKDF2_ITERATIONS", args.pbkdf2_iterations),
+                        ("SCRYPT_WORK_FACTOR", args.scrypt_work_factor),
+                        ("ARGON2_TIME_COST", args.argon2_time_cost),
+                        ("ARGON2_MEMORY_COST", args.argon2_memory_cost)]:
+        if value is not None:
+            costs[name] = value
+
+    with test_database(), override_settings(PASSWORD_HASHING=costs, PASSWORD_HASHERS=[HASHERS[args.hasher]]):
+        CustomUser.objects.create_user(username="member", email="member@example.com", password=PASSWORD)
+        if args.offload:
+            hashers.enable_offload(settings.PASSWORD_HASHING_WORKERS)
+
+        def login(_):
+            start = time.perf_counter()
+            response = Client().post(
+                "/api/accounts/login/", {"email": "member@example.com", "password": PASSWORD},
+                content_type="application/json",
+            )
+            assert response.status_code == 200, response.content
+            return (time.perf_counter() - start) * 1000
+
+        login(None)  # warm up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            timings = sorted(pool.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - start
+        hashers.disable_offload()
+
+        report({
+            "hasher": args.hasher,
+            "costs": {key: value for key, value in costs.items() if key.startswith(args.hasher.upper())},
+            "concurrency": args.concurrency,
+            "offload": args.offload,
+            "logins_per_second": round(args.logins / elapsed, 2),
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        })
+
+
+if __name__ == "__main__":
+    main()
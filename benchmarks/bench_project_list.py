@@ -0,0 +1,70 @@
+"""
+Project listing: DISTINCT membership join vs EXISTS semi-join.
+
+    python -m benchmarks.bench_project_list --projects 10000 --owners 100
+"""
+import argparse
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def seed(projects, owners):
+    from django.contrib.auth.hashers import make_password
+    from accounts.models import CustomUser
+    from core.models import Project, ProjectUserRole
+
+    password = make_password(None)
+    member = CustomUser.objects.create(username="member", email="member@example.com", password=password)
+    owner_users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"owner{i}", email=f"owner{i}@example.com", password=password)
+        for i in range(owners)
+    ])
+    created = Project.objects.bulk_create([
+        Project(name=f"Project {i}", owner=owner_users[i % owners]) for i in range(projects)
+    ], batch_size=1000)
+    ProjectUserRole.objects.bulk_create([
+        ProjectUserRole(user=member, project=project, role="editor") for project in created
+    ], batch_size=1000)
+    return member
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--owners", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.test import APIClient
+    from core.models import Project
+
+    with test_database():
+        member = seed(args.projects, args.owners)
+        ordering = ("-created_at", "-id")
+        page = args.page_size
+
+        def distinct_join():
+            projects = Project.objects.filter(members__user=member).distinct().order_by(*ordering)[:page]
+            return [(project.pk, str(project.owner)) for project in projects]
+
+        def exists_semi_join():
+            projects = Project.objects.visible_to(member).with_role(member) \
+                .select_related("owner").order_by(*ordering)[:page]
+            return [(project.pk, str(project.owner), project.my_role) for project in projects]
+
+        client = APIClient()
+        client.force_authenticate(user=member)
+
+        report({
+            "projects_per_user": args.projects,
+            "page_size": page,
+            "distinct_join": measure(distinct_join, args.repeat),
+            "exists_semi_join": measure(exists_semi_join, args.repeat),
+            "api_list": measure(lambda: client.get(f"/api/projects/?page_size={page}"), args.repeat),
+        })
+
+
+if __name__ == "__main__":
+    main()
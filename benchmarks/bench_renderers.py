@@ -0,0 +1,68 @@
+"""
+JSON encode throughput on large comment lists: DRF's JSONRenderer vs FastJSONRenderer.
+
+    python -m benchmarks.bench_renderers --comments 50000
+"""
+import argparse
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import measure, report, setup_django
+
+
+def comment_rows(count):
+    """Comment dicts as the list endpoints produce them, and with raw UUID/datetime values."""
+    project, author = uuid.uuid4(), uuid.uuid4()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    raw = [
+        {
+            "id": uuid.uuid4(),
+            "text": f"Comment {i} with some ünïcode text",
+            "created_at": start + timedelta(seconds=i, microseconds=i),
+            "project": project,
+            "author": author,
+        }
+        for i in range(count)
+    ]
+    from rest_framework.fields import DateTimeField
+    created_at = DateTimeField()
+    encoded = [
+        {
+            "id": str(row["id"]),
+            "text": row["text"],
+            "created_at": created_at.to_representation(row["created_at"]),
+            "project": str(row["project"]),
+            "author": str(row["author"]),
+        }
+        for row in raw
+    ]
+    return raw, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from core import renderers
+
+    raw, encoded = comment_rows(args.comments)
+    stdlib, fast = JSONRenderer(), renderers.FastJSONRenderer()
+    assert stdlib.render(encoded) == fast.render(encoded)
+    assert stdlib.render(raw) == fast.render(raw)
+
+    results = {"rows": args.comments, "backend": "orjson" if renderers.orjson else "stdlib"}
+    for name, renderer in [("json_renderer", stdlib), ("fast_json_renderer", fast)]:
+        for payload_name, payload in [("serialized", encoded), ("raw_uuid_datetime", raw)]:
+            stats = measure(lambda: renderer.render(payload), args.repeat)
+            stats.pop("queries")
+            stats["rows_per_second"] = round(args.comments / (stats["mean_ms"] / 1000))
+            results[f"{name}.{payload_name}"] = stats
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+List serialization throughput: DRF serializers vs the .values() fast path.
+
+    python -m benchmarks.bench_serializers --comments 5000
+"""
+import argparse
+import time
+
+from benchmarks.harness import measure, report, setup_django, test_database
+
+
+def seed(comments):
+    from django.contrib.auth.hashers import make_password
+    from accounts.models import CustomUser
+    from core.models import Comment, Project, ProjectUserRole
+
+    user = CustomUser.objects.create(username="member", email="member@example.com", password=make_password(None))
+    project = Project.objects.create(name="Benchmark", owner=user)
+    ProjectUserRole.objects.create(user=user, project=project, role="owner")
+    Comment.objects.bulk_create([
+        Comment(project=project, author=user, text=f"Comment {i}") for i in range(comments)
+    ], batch_size=1000)
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from core.models import Comment
+    from core.serializers import CommentSerializer, CommentValuesSerializer
+
+    with test_database():
+        seed(args.comments)
+        queryset = Comment.objects.order_by("-created_at", "-id")
+        renderer = JSONRenderer()
+
+        def drf_serializer():
+            return renderer.render(CommentSerializer(list(queryset.all()), many=True).data)
+
+        def values_fast_path():
+            return renderer.render(CommentValuesSerializer.serialize(queryset.values(*CommentValuesSerializer.lookups())))
+
+        assert drf_serializer() == values_fast_path()
+
+        results = {"rows": args.comments}
+        for name, fn in [("drf_serializer", drf_serializer), ("values_fast_path", values_fast_path)]:
+            results[name] = measure(fn, args.repeat)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                fn()
+            results[name]["rows_per_second"] = round(args.comments * args.repeat / (time.perf_counter() - start))
+        report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Shared helpers for the scripts in this package.
+
+Benchmarks run in-process against a throwaway test database, so they never
+touch db.sqlite3. Run them from the repository root, e.g.:
+
+    python -m benchmarks.bench_project_list --projects 10000
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project_management_app.settings")
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the duration of the benchmark."""
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+        teardown_test_environment
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(fn, repeat):
+    """Run fn `repeat` times and return latency percentiles in milliseconds and its query count."""
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    fn()  # warm up
+    reset_queries()  # requests reset the log themselves, so start from empty
+    with CaptureQueriesContext(connection) as queries:
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "queries": len(queries),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+    }
+
+
+def report(results):
+    print(json.dumps(results, indent=2))
@@ -7,8 +7,11 @@ SUCCESS_PROJECT_DELETED = "Project deleted successfully."
 SUCCESS_COMMENT_CREATED = "Comment added successfully."
 SUCCESS_COMMENT_UPDATED = "Comment updated successfully."
 SUCCESS_COMMENT_DELETED = "Comment deleted successfully."
+SUCCESS_COMMENTS_IMPORTED = "Comments imported successfully."
+SUCCESS_COMMENTS_PARTIALLY_IMPORTED = "The import file could not be parsed past some record; the comments before it were imported."
 SUCCESS_ROLE_ASSIGNED = "Role assigned successfully."
 SUCCESS_ROLE_REMOVED = "Role removed successfully."
+SUCCESS_ROLES_ASSIGNED = "Roles assigned successfully."
 
 # Error messages
 ERROR_FETCHING_PROFILE = "Failed to fetch the user profile"
@@ -32,3 +35,9 @@ ERROR_CREATING_COMMENT = "Failed to create the comment."
 ERROR_UPDATING_COMMENT = "An error occurred while updating the comment."
 ERROR_DELETING_COMMENT = "An error occurred while deleting the comment."
 ERROR_COMMENT_NOT_FOUND = "The requested comment was not found."
+ERROR_INVALID_PROJECT_FILTER = "Must be a valid project UUID."
+ERROR_INVALID_IMPORT_FILE = "The import file could not be parsed."
+ERROR_SEARCH_QUERY_REQUIRED = "Enter a search term."
+ERROR_INVALID_CHANGES_CURSOR = "The cursor must be a non-negative integer."
+ERROR_EVENTS_DROPPED = "The stream fell behind; reconnect to resume from the last event."
+ERROR_EVENTS_REVOKED = "You are no longer a member of this project."
@@ -0,0 +1,292 @@
+"""
+Async (ASGI-native) list, retrieve and create endpoints for projects,
+comments and roles, served under /api/async/.
+
+They answer like the viewsets in core.views, but authenticate, check
+permissions and read through Django's async ORM, so under ASGI a request
+waiting on the client or the database does not hold a thread. Writes and
+validation that query the database still run their atomic block in a thread,
+since Django has no async transactions.
+"""
+import asyncio
+import uuid
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from accounts.authentication import ClaimsJWTAuthentication
+from constants import ERROR_EVENTS_DROPPED, ERROR_EVENTS_REVOKED, ERROR_INVALID_CHANGES_CURSOR, ERROR_INVALID_PROJECT_FILTER, \
+    ERROR_UNAUTHORIZED_ROLE_ASSIGN, ERROR_USER_ALREADY_HAS_ROLE
+from . import changes, counters, events
+from .models import Comment, Project, ProjectUserRole
+from .pagination import KeysetPagination
+from .parsers import FastJSONParser
+from .permissions import IsOwner, IsOwnerOrEditorOrReader
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .roles import get_role_resolver
+from .serializers import CommentSerializer, CommentValuesSerializer, ProjectSerializer, ProjectUserRoleSerializer, \
+    ProjectUserRoleValuesSerializer, ProjectValuesSerializer
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async views:
+    - JWT authentication through ClaimsJWTAuthentication, required for every method.
+    - JSON request bodies and responses; APIExceptions become error responses
+      shaped like DRF's.
+    """
+    authentication_class = ClaimsJWTAuthentication
+    permission_class = None
+    pagination_class = KeysetPagination
+    cursor_ordering = ("-created_at", "-id")
+    http_method_names = ["get", "post"]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # As DRF's APIView does: requests authenticate with a Bearer token, which browsers never send on their own
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.query_params = request.GET
+        try:
+            await self.authenticate(request)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            return await handler(request, *args, **kwargs)
+        except Http404:
+            return self.error_response(exceptions.NotFound())
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+    async def authenticate(self, request):
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+    async def check_object_permissions(self, request, obj):
+        if not await self.permission_class().ahas_object_permission(request, self, obj):
+            raise PermissionDenied()
+
+    def parse(self, request):
+        return FastJSONParser().parse(BytesIO(request.body), request.content_type)
+
+    def respond(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(FastJSONRenderer().render(data), status=status_code, content_type="application/json")
+
+    def error_response(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = self.respond(data, exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = 'Bearer realm="api"'
+        return response
+
+    async def list_response(self, request, queryset, values_serializer):
+        paginator = self.pagination_class()
+        page = paginator.page_queryset(queryset.values(*values_serializer.lookups()), request, self)
+        rows = paginator.paginate_rows([row async for row in page])
+        return self.respond({"next": paginator.get_next_link(), "results": values_serializer.serialize(rows)})
+
+    async def get_object(self, queryset, pk):
+        try:
+            obj = await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise Http404
+        await self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class ProjectListView(AsyncAPIView):
+    async def get(self, request):
+        queryset = Project.objects.visible_to(request.user).with_role(request.user)
+        return await self.list_response(request, queryset, ProjectValuesSerializer)
+
+    async def post(self, request):
+        """Only Owners and Editors can create projects."""
+        serializer = ProjectSerializer(data=self.parse(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        resolver = get_role_resolver(request)
+        if not await resolver.aroles():
+            raise PermissionDenied("You do not have permission to create a project.")
+        if not await resolver.ahas_any_role("owner", "editor"):
+            raise PermissionDenied("Readers cannot create projects.")
+
+        await sync_to_async(self.create)(serializer, request.user)
+        resolver.remember(serializer.instance.pk, "owner")
+        return self.respond(serializer.data, status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create(serializer, user):
+        with transaction.atomic():
+            project = serializer.save(owner=user, member_count=1)
+            ProjectUserRole.objects.create(user=user, project=project, role="owner")
+
+
+class ProjectDetailView(AsyncAPIView):
+    permission_class = IsOwnerOrEditorOrReader
+
+    async def get(self, request, pk):
+        queryset = Project.objects.visible_to(request.user).with_role(request.user).select_related("owner")
+        project = await self.get_object(queryset, pk)
+        return self.respond(ProjectSerializer(project).data)
+
+    async def check_object_permissions(self, request, obj):
+        # The annotated role saves the permission check its own lookup
+        if obj.my_role:
+            get_role_resolver(request).remember(obj.pk, obj.my_role)
+        await super().check_object_permissions(request, obj)
+
+
+class ProjectEventsView(ProjectDetailView):
+    """
+    Server-sent events of a project's comments and roles, as they commit.
+    - Each event is shaped like a changes feed result, with the entry's cursor
+      as its id; a reconnecting client's `Last-Event-ID` (or `?since=`)
+      replays what it missed from the change log.
+    - A stream that falls behind gets a `dropped` event and is closed, as is
+      a stream whose user leaves the project (`revoked`). Streams also end
+      after EVENTS_MAX_STREAM_SECONDS, so tokens are checked again.
+    """
+    replay_batch_size = 500
+
+    async def get(self, request, pk):
+        project = await self.get_object(Project.objects.visible_to(request.user).with_role(request.user), pk)
+        since = request.headers.get("Last-Event-ID") or request.GET.get("since")
+        try:
+            since = int(since) if since is not None else None
+        except ValueError:
+            raise ValidationError({"since": ERROR_INVALID_CHANGES_CURSOR})
+
+        response = StreamingHttpResponse(
+            self.stream(request.user, project.pk, since), content_type=EventStreamRenderer.media_type
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, user, project_id, since):
+        renderer = EventStreamRenderer()
+        subscription = events.hub.subscribe(project_id)
+        try:
+            # Subscribed first, so nothing committed after the replay is missed
+            if since is None:
+                since = await sync_to_async(changes.latest_cursor)()
+            else:
+                while replayed := await sync_to_async(self.replay)(project_id, since):
+                    for event in replayed:
+                        yield renderer.render(event, renderer_context={"id": event["cursor"], "event": event["type"]})
+                    since = replayed[-1]["cursor"]
+            events.get_broker().subscribed(since)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.EVENTS_MAX_STREAM_SECONDS
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    event = await subscription.get(min(settings.EVENTS_KEEPALIVE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is events.DROPPED:
+                    yield renderer.render({"detail": ERROR_EVENTS_DROPPED}, renderer_context={"event": "dropped"})
+                    return
+                if event["cursor"] <= since:
+                    continue
+                since = event["cursor"]
+                yield renderer.render(event, renderer_context={"id": since, "event": event["type"]})
+                if event["type"] == changes.ROLE and not await ProjectUserRole.objects.filter(
+                        project_id=project_id, user=user).aexists():
+                    yield renderer.render({"detail": ERROR_EVENTS_REVOKED}, renderer_context={"event": "revoked"})
+                    return
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    def replay(self, project_id, since):
+        entries = changes.project_changes([project_id], since, self.replay_batch_size, events.STREAMED_KINDS)
+        return changes.serialize(entries, None)
+
+
+class CommentListView(AsyncAPIView):
+    async def get(self, request):
+        """Comments on the caller's projects, optionally narrowed with `?project=<uuid>`."""
+        queryset = Comment.objects.visible_to(request.user)
+
+        project_id = request.GET.get("project")
+        if project_id:
+            try:
+                project_id = uuid.UUID(project_id)
+            except ValueError:
+                raise ValidationError({"project": ERROR_INVALID_PROJECT_FILTER})
+            queryset = queryset.filter(project_id=project_id)
+        return await self.list_response(request, queryset, CommentValuesSerializer)
+
+    async def post(self, request):
+        """Only Owners and Editors can create comments."""
+        serializer = CommentSerializer(data=self.parse(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        project = serializer.validated_data["project"]
+        if await get_role_resolver(request).arole_for(project.pk) not in ["owner", "editor"]:
+            raise PermissionDenied("You do not have permission to add comments.")
+
+        await sync_to_async(self.create)(serializer, request.user)
+        return self.respond(serializer.data, status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create(serializer, user):
+        with transaction.atomic():
+            comment = serializer.save(author=user)
+            counters.comments_added(comment.project_id, last_comment_at=comment.created_at)
+
+
+class CommentDetailView(AsyncAPIView):
+    permission_class = IsOwnerOrEditorOrReader
+
+    async def get(self, request, pk):
+        comment = await self.get_object(Comment.objects.visible_to(request.user), pk)
+        return self.respond(CommentSerializer(comment).data)
+
+
+class RoleListView(AsyncAPIView):
+    cursor_ordering = ("id",)
+
+    async def get(self, request):
+        return await self.list_response(request, ProjectUserRole.objects.all(), ProjectUserRoleValuesSerializer)
+
+    async def post(self, request):
+        """Only Owners can assign roles."""
+        serializer = ProjectUserRoleSerializer(data=self.parse(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        project = serializer.validated_data["project"]
+        user = serializer.validated_data["user"]
+        if await ProjectUserRole.objects.filter(user=user, project=project).aexists():
+            raise ValidationError(ERROR_USER_ALREADY_HAS_ROLE)
+        if await get_role_resolver(request).arole_for(project.pk) != "owner":
+            raise PermissionDenied(ERROR_UNAUTHORIZED_ROLE_ASSIGN)
+
+        await sync_to_async(self.create)(serializer)
+        return self.respond(serializer.data, status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create(serializer):
+        with transaction.atomic():
+            role = serializer.save()
+            counters.members_changed(role.project_id, 1)
+
+
+class RoleDetailView(AsyncAPIView):
+    permission_class = IsOwner
+
+    async def get(self, request, pk):
+        role = await self.get_object(ProjectUserRole.objects.all(), pk)
+        return self.respond(ProjectUserRoleSerializer(role).data)
@@ -0,0 +1,170 @@
+"""
+Change log behind the incremental changes feed, `GET /api/changes/`.
+
+Every write to a project, comment or role appends a ChangeLogEntry: the
+signals in core.signals cover single-object writes, and bulk paths that send
+no signals call record_many() themselves. Entry ids only grow, so a client
+keeps the last id it has seen as its cursor and asks for what came after it.
+
+Ids are taken when a transaction inserts, not when it commits, so (on
+PostgreSQL) a later id can become visible before an earlier one. The feed is
+therefore cut at the horizon: the highest id below which no entry may still commit.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core.models import ChangeLogEntry, Comment, Project, ProjectUserRole
+from core.serializers import CommentValuesSerializer, ProjectUserRoleValuesSerializer, ProjectValuesSerializer
+
+PROJECT = "project"
+COMMENT = "comment"
+ROLE = "role"
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# How many ids below the newest one the first sync of the horizon checks for gaps
+GAP_SCAN = 10_000
+
+# Sent with the new entries (saved, not yet committed) whenever the log grows
+logged = Signal()
+
+
+def entry(kind, action, obj):
+    """An unsaved entry for a project, comment or role."""
+    if kind == PROJECT:
+        return ChangeLogEntry(kind=kind, action=action, object_id=obj.pk, project_id=obj.pk)
+    # Role entries also name the member, who keeps seeing them once removed
+    user_id = obj.user_id if kind == ROLE else None
+    return ChangeLogEntry(kind=kind, action=action, object_id=obj.pk, project_id=obj.project_id, user_id=user_id)
+
+
+def record(kind, action, obj):
+    new = entry(kind, action, obj)
+    new.save()
+    logged.send(sender=ChangeLogEntry, entries=[new])
+
+
+def record_many(kind, action, objects):
+    entries = ChangeLogEntry.objects.bulk_create([entry(kind, action, obj) for obj in objects])
+    logged.send(sender=ChangeLogEntry, entries=entries)
+
+
+class ChangeLogHorizon:
+    """
+    The highest change log id that no uncommitted entry can precede, tracked
+    as accounts.blacklist.JTIBlacklist tracks blacklist ids:
+    - Each sync reads the ids added since the last one, and re-checks the
+      missing ids (gaps) below them, which may belong to open transactions.
+    - The horizon stays below the oldest gap until its entry shows up, or until
+      the entry after it is older than CHANGES_GAP_SECONDS: no transaction runs
+      that long, so the id was rolled back.
+    Not used with CHANGES_GAP_SECONDS at 0 (SQLite, whose writers commit in id order).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._last_id = None
+        self._gaps = {}  # id -> datetime after which it counts as rolled back
+
+    def current(self):
+        with self._lock:
+            self._sync(timedelta(seconds=settings.CHANGES_GAP_SECONDS))
+            return min(self._gaps) - 1 if self._gaps else self._last_id
+
+    def _sync(self, timeout):
+        if self._last_id is None:
+            latest = ChangeLogEntry.objects.order_by("-id").values_list("id", flat=True).first() or 0
+            self._last_id = max(latest - GAP_SCAN, 0)
+
+        rows = ChangeLogEntry.objects.filter(Q(id__gt=self._last_id) | Q(id__in=list(self._gaps)))
+        previous = self._last_id
+        for pk, created_at in rows.order_by("id").values_list("id", "created_at"):
+            self._gaps.pop(pk, None)
+            if pk > self._last_id:
+                for missing in range(max(previous, pk - GAP_SCAN) + 1, pk):
+                    self._gaps[missing] = created_at + timeout
+                previous = self._last_id = pk
+
+        now = timezone.now()
+        self._gaps = {pk: deadline for pk, deadline in self._gaps.items() if deadline > now}
+
+
+horizon = ChangeLogHorizon()
+
+
+def latest_cursor():
+    if getattr(settings, "CHANGES_GAP_SECONDS", 0):
+        return horizon.current()
+    return ChangeLogEntry.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def changes_for(user, since, limit):
+    """
+    Up to `limit` entries after the cursor `since`, oldest first, for the
+    user's projects, plus entries about the user's own roles (so removal from
+    a project still reaches the removed member).
+    Entries past the horizon are held back until a later call. Members of a
+    deleted project keep seeing its entries, the tombstone included, until it
+    is purged.
+    """
+    queryset = ChangeLogEntry.objects.filter(
+        Q(Exists(ProjectUserRole.all_objects.filter(project=OuterRef("project_id"), user=user))) | Q(user_id=user.pk),
+        id__gt=since,
+    )
+    return list(_up_to_horizon(queryset).order_by("id")[:limit])
+
+
+def project_changes(project_ids, since, limit, kinds=None):
+    """Up to `limit` entries after `since` on the given projects, oldest first, up to the horizon."""
+    queryset = ChangeLogEntry.objects.filter(project_id__in=project_ids, id__gt=since)
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    return list(_up_to_horizon(queryset).order_by("id")[:limit])
+
+
+def _up_to_horizon(queryset):
+    if getattr(settings, "CHANGES_GAP_SECONDS", 0):
+        queryset = queryset.filter(id__lte=horizon.current())
+    return queryset
+
+
+def serialize(entries, user=None):
+    """
+    Represent entries as the feed does, each with its object as the lists show
+    it (None once deleted), in one query per kind. Projects carry the user's
+    `my_role`, which is null without a user.
+    """
+    sources = {
+        PROJECT: (Project.objects.with_role(user), ProjectValuesSerializer),
+        COMMENT: (Comment.objects.all(), CommentValuesSerializer),
+        ROLE: (ProjectUserRole.objects.all(), ProjectUserRoleValuesSerializer),
+    }
+    objects = {}
+    for kind, (queryset, serializer) in sources.items():
+        ids = {entry.object_id for entry in entries if entry.kind == kind}
+        if ids:
+            rows = queryset.filter(pk__in=ids).values(*serializer.lookups())
+            for item in serializer.serialize(rows):
+                objects[kind, item["id"]] = item
+
+    return [
+        {
+            "cursor": entry.id,
+            "type": entry.kind,
+            "action": entry.action,
+            "id": entry.object_id,
+            "project": entry.project_id,
+            "object": objects.get((entry.kind, str(entry.object_id))),
+        }
+        for entry in entries
+    ]
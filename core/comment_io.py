@@ -0,0 +1,118 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from core import changes, counters, search
+from core.models import Comment
+from core.serializers import CommentValuesSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def _export_rows(project):
+    """Yield the project's comments, oldest first, as CommentSerializer would represent them."""
+    rows = Comment.objects.filter(project=project).order_by("created_at", "id") \
+        .values(*CommentValuesSerializer.lookups()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield from CommentValuesSerializer.serialize(chunk)
+
+
+def export_ndjson(project):
+    for row in _export_rows(project):
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """A file-like object whose write() returns the value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(project):
+    writer = csv.writer(_Echo())
+    fields = [name for name, _, _ in CommentValuesSerializer.columns()]
+    yield writer.writerow(fields)
+    for row in _export_rows(project):
+        yield writer.writerow([row[name] for name in fields])
+
+
+async def aiter_export(rows):
+    """
+    Serve an export under ASGI, where Django would read a sync iterator whole
+    before sending it. Rows are read EXPORT_CHUNK_SIZE at a time in the
+    request's sync thread, which holds the database cursor, and sent as one chunk.
+    """
+    read = sync_to_async(lambda: "".join(islice(rows, EXPORT_CHUNK_SIZE)), thread_sensitive=True)
+    while chunk := await read():
+        yield chunk
+
+
+def _ndjson_records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _csv_records(lines):
+    yield from csv.DictReader(lines)
+
+
+def import_comments(stream, project, author, fmt="ndjson"):
+    """
+    Read comments from a request body stream and insert them in batches.
+    - The body is consumed line by line, so memory stays flat.
+    - Each batch commits on its own; records without a non-empty "text" are
+      skipped and reported with their record number.
+    - A body that stops decoding (bad UTF-8, broken CSV) ends the import: the
+      records read so far are kept, and "stopped_at" gives the record number
+      the import could not read. It is None when the whole body was read.
+    """
+    lines = (line.decode("utf-8") for line in stream) if stream is not None else iter(())
+    records = _csv_records(lines) if fmt == "csv" else _ndjson_records(lines)
+
+    imported, failed, errors, batch, stopped_at = 0, 0, [], [], None
+
+    def flush():
+        with transaction.atomic():
+            Comment.objects.bulk_create(batch)
+            # bulk_create sends no post_save, so index and log the batch here
+            search.index_comments(batch)
+            changes.record_many(changes.COMMENT, changes.CREATED, batch)
+            counters.comments_added(project.pk, len(batch), max(comment.created_at for comment in batch))
+        batch.clear()
+
+    number = 0
+    try:
+        for number, record in enumerate(records, start=1):
+            text = record.get("text") if isinstance(record, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"record": number, "error": "A non-empty \"text\" is required."})
+                continue
+
+            batch.append(Comment(project=project, author=author, text=text))
+            imported += 1
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+    except (UnicodeDecodeError, csv.Error):
+        # Earlier batches are committed already: keep the valid records before the error too
+        stopped_at = number + 1
+
+    if batch:
+        flush()
+    return {"imported": imported, "failed": failed, "errors": errors, "stopped_at": stopped_at}
@@ -0,0 +1,82 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from core import tasks
+from core.models import Comment, Project, ProjectUserRole
+
+COUNTER_FIELDS = ["comment_count", "last_comment_at", "member_count"]
+
+
+def latest_comment_at():
+    """Subquery for the creation time of a project's latest comment."""
+    return Subquery(
+        Comment.all_objects.filter(project=OuterRef("pk")).order_by("-created_at").values("created_at")[:1]
+    )
+
+
+def _count(model):
+    rows = model.all_objects.filter(project=OuterRef("pk")).order_by().values("project")
+    return Coalesce(Subquery(rows.annotate(n=Count("pk")).values("n")), 0)
+
+
+def actual_counters():
+    """Annotations recomputing the activity summary from the comment and role tables."""
+    return {
+        "actual_comment_count": _count(Comment),
+        "actual_last_comment_at": latest_comment_at(),
+        "actual_member_count": _count(ProjectUserRole),
+    }
+
+
+def comments_added(project_id, count=1, last_comment_at=None):
+    """Count new comments on a project in one atomic UPDATE."""
+    last_comment_at = last_comment_at or timezone.now()
+    Project.objects.filter(pk=project_id).update(
+        comment_count=F("comment_count") + count,
+        last_comment_at=Greatest(Coalesce("last_comment_at", Value(last_comment_at)), Value(last_comment_at)),
+        updated_at=timezone.now(),
+    )
+
+
+def comments_removed(project_id, count=1):
+    """
+    Uncount deleted comments; the latest comment time is re-read from the
+    remaining ones. Counts never go below zero, even when they had drifted.
+    """
+    Project.objects.filter(pk=project_id).update(
+        comment_count=Greatest(F("comment_count") - count, Value(0)),
+        last_comment_at=latest_comment_at(),
+        updated_at=timezone.now(),
+    )
+
+
+def members_changed(project_id, delta):
+    """Add delta (negative on removal) to a project's member count in one atomic UPDATE."""
+    Project.objects.filter(pk=project_id).update(
+        member_count=Greatest(F("member_count") + delta, Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def recompute(project_ids):
+    """
+    Recompute the counters of projects from their comments and roles, inside
+    the UPDATE itself so concurrent writes are not overwritten.
+    """
+    actual = actual_counters()
+    Project.objects.filter(pk__in=project_ids).update(
+        **{field: actual[f"actual_{field}"] for field in COUNTER_FIELDS},
+        updated_at=timezone.now(),
+    )
+
+
+@tasks.task
+def refresh(project_id):
+    """Background repair of one project's drifted counters; queued by recompute_project_counters --queue."""
+    recompute([project_id])
+
+
+def refresh_later(project_id):
+    """Queue refresh() once the current transaction commits; a queued refresh of the project covers this one."""
+    tasks.enqueue(refresh, key=f"counters:{project_id}", project_id=project_id)
@@ -0,0 +1,60 @@
+"""
+Read-replica routing:
+- Reads go to the alias set by read_from_replica() (see
+  core.mixins.ReplicaReadMixin), everything else goes to the primary.
+- A user who just wrote is "sticky" to the primary for
+  REPLICA_STICKY_SECONDS, so they read their own writes despite replica lag.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_alias():
+    """Return the configured replica alias, or None when reads stay on the primary."""
+    return getattr(settings, "REPLICA_DATABASE_ALIAS", None)
+
+
+@contextmanager
+def read_from_replica(alias=None):
+    token = _read_alias.set(alias or replica_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _sticky_cache():
+    return caches[getattr(settings, "REPLICA_STICKY_CACHE_ALIAS", "default")]
+
+
+def _sticky_key(user_id):
+    return f"replica:sticky:{user_id}"
+
+
+def mark_sticky(user_id):
+    _sticky_cache().set(_sticky_key(user_id), True, getattr(settings, "REPLICA_STICKY_SECONDS", 5))
+
+
+def is_sticky(user_id):
+    return bool(_sticky_cache().get(_sticky_key(user_id)))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,206 @@
+"""
+Live comment and role events of a project, streamed as server-sent events
+from `/api/async/projects/<id>/events/` (see core.async_views).
+
+Events are change log entries (core.changes), so their ids are feed cursors:
+- The hub fans events out to the subscribers of each project. A subscriber
+  has a bounded queue; one that falls EVENTS_QUEUE_SIZE events behind is
+  dropped, and replays from the change log when it reconnects.
+- The broker, EVENTS_BROKER, brings events to the hub. LocalBroker publishes
+  this process's own writes once they commit, which is enough for a single
+  worker. ChangeLogBroker polls the change log, so every worker sees the
+  writes of all of them.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from core import changes
+
+logger = logging.getLogger(__name__)
+
+STREAMED_KINDS = (changes.COMMENT, changes.ROLE)
+
+# Queued in place of the backlog of a subscriber that fell behind
+DROPPED = object()
+
+
+class Subscription:
+    """One stream's queue. Created, filled and read on the stream's event loop."""
+
+    def __init__(self, project_id, maxsize):
+        self.project_id = project_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def offer(self, events):
+        for event in events:
+            if self.dropped:
+                return
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.drop()
+
+    def drop(self):
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(DROPPED)
+
+    async def get(self, timeout):
+        """The next event, DROPPED, or asyncio.TimeoutError after `timeout` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Hub:
+    """Per-process fan-out of serialized events to the subscribers of each project."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, project_id, maxsize=None):
+        subscription = Subscription(project_id, maxsize or getattr(settings, "EVENTS_QUEUE_SIZE", 100))
+        with self._lock:
+            self._subscribers[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.project_id]
+
+    def project_ids(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def has_subscribers(self, project_id):
+        with self._lock:
+            return project_id in self._subscribers
+
+    def publish(self, events):
+        """Hand events to their project's subscribers; safe to call from any thread."""
+        by_project = defaultdict(list)
+        for event in events:
+            by_project[event["project"]].append(event)
+
+        for project_id, batch in by_project.items():
+            with self._lock:
+                subscribers = list(self._subscribers.get(project_id, ()))
+            for subscription in subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, batch)
+                except RuntimeError:
+                    # Its event loop is closed: the stream is gone
+                    self.unsubscribe(subscription)
+
+    def reset(self):
+        with self._lock:
+            self._subscribers.clear()
+
+
+hub = Hub()
+
+
+class LocalBroker:
+    """Publishes this process's writes to its hub as they commit."""
+
+    def logged(self, entries):
+        entries = [
+            entry for entry in entries
+            if entry.kind in STREAMED_KINDS and hub.has_subscribers(entry.project_id)
+        ]
+        if entries:
+            transaction.on_commit(lambda: hub.publish(changes.serialize(entries, None)), robust=True)
+
+    def subscribed(self, cursor):
+        pass
+
+
+class ChangeLogBroker:
+    """
+    Polls the change log every EVENTS_POLL_INTERVAL seconds, from one thread
+    that runs while the process has subscribers. Every worker's writes reach
+    every worker's streams, at the cost of the polling delay.
+    """
+    batch_size = 500
+    max_retry_delay = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cursor = 0
+
+    def logged(self, entries):
+        pass
+
+    def subscribed(self, cursor):
+        """
+        Start the poller from the cursor of a stream that has subscribed and
+        replayed up to it; a running poller is already past anything older.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._cursor = cursor
+                self._thread = threading.Thread(target=self.run, name="events-poller", daemon=True)
+                self._thread.start()
+
+    def run(self):
+        retry_delay = getattr(settings, "EVENTS_POLL_INTERVAL", 1)
+        try:
+            while True:
+                try:
+                    if not self.poll():
+                        return
+                    retry_delay = getattr(settings, "EVENTS_POLL_INTERVAL", 1)
+                except Exception:
+                    # A lost connection or a locked database must not stop the streams for good
+                    logger.exception("Polling the change log failed; retrying in %s seconds.", retry_delay)
+                    connections.close_all()
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, self.max_retry_delay)
+        finally:
+            connections.close_all()
+            with self._lock:
+                # Let the next subscriber start a new poller, however this one ended
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def poll(self):
+        """Publish one batch, or wait when there is none. False once there are no subscribers left."""
+        with self._lock:
+            project_ids = hub.project_ids()
+            if not project_ids:
+                self._thread = None
+                return False
+            cursor = self._cursor
+
+        entries = changes.project_changes(project_ids, cursor, self.batch_size, STREAMED_KINDS)
+        if entries:
+            with self._lock:
+                self._cursor = max(self._cursor, entries[-1].id)
+            hub.publish(changes.serialize(entries, None))
+        else:
+            time.sleep(getattr(settings, "EVENTS_POLL_INTERVAL", 1))
+        return True
+
+
+_brokers = {}
+
+
+def get_broker():
+    path = getattr(settings, "EVENTS_BROKER", "core.events.LocalBroker")
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.purge import deleted_projects, purge_project
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete soft-deleted projects with their comments and roles, in batches. "
+        "Safe to interrupt: the next run carries on where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        projects = list(deleted_projects().only("pk", "comment_count", "member_count"))
+
+        for n, project in enumerate(projects, 1):
+            # The counters are only an estimate of what is left: the last run may have stopped midway
+            totals = {"comments": project.comment_count, "roles": project.member_count}
+
+            def progress(label, deleted):
+                self.stdout.write(f"Project {project.pk}: deleted {deleted}/~{totals[label]} {label}.")
+
+            purge_project(project, batch_size, progress)
+            self.stdout.write(f"Purged {n} of {len(projects)} projects.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {len(projects)} projects purged."))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import COUNTER_FIELDS, actual_counters, recompute, refresh_later
+from core.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recompute the comment and member counters of every project, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--queue", action="store_true",
+                            help="Queue the stale projects' repair for the run_tasks worker instead of repairing here.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        verb = "queued for repair" if options["queue"] else "corrected"
+        checked = corrected = 0
+        last_pk = None
+
+        while True:
+            projects = Project.objects.order_by("pk").annotate(**actual_counters())
+            if last_pk is not None:
+                projects = projects.filter(pk__gt=last_pk)
+            batch = list(projects[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            stale = [
+                project.pk for project in batch
+                if any(getattr(project, f"actual_{field}") != getattr(project, field) for field in COUNTER_FIELDS)
+            ]
+            if stale and options["queue"]:
+                for project_id in stale:
+                    refresh_later(project_id)
+            elif stale:
+                recompute(stale)
+
+            checked += len(batch)
+            corrected += len(stale)
+            self.stdout.write(f"Checked {checked} projects, {corrected} {verb}.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {corrected} of {checked} projects {verb}."))
@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.tasks import claim, execute, finish
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks on a pool of processes, polling for new ones. "
+        "Start as many workers as needed: each claims its own batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Size of the process pool; 0 runs tasks in this process.")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due.")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        # Spawned rather than forked, so no process shares this one's database connections
+        pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup,
+        ) if processes else nullcontext()
+        run = pool.map if processes else map
+        succeeded = failed = 0
+
+        with pool:
+            while True:
+                batch = claim(options["batch_size"])
+                if not batch:
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    time.sleep(getattr(settings, "TASKS_POLL_INTERVAL", 1))
+                    continue
+
+                for task, error in zip(batch, run(execute, [task.name for task in batch],
+                                                  [task.kwargs for task in batch])):
+                    finish(task, error)
+                    if error is None:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f"Task {task.pk} ({task.name}) failed, attempt {task.attempts}:\n{error}")
+                self.stdout.write(f"Ran {succeeded + failed} tasks, {failed} failed.")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {succeeded} tasks succeeded, {failed} failed."))
@@ -0,0 +1,103 @@
+import random
+import uuid
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import CustomUser
+from core import search
+from core.models import Comment, Project, ProjectUserRole
+
+WORDS = (
+    "launch review budget design sprint release backend frontend database migration deploy rollback "
+    "invoice client meeting roadmap milestone deadline testing security audit feedback prototype "
+    "analytics dashboard mobile search cache latency outage incident report planning hiring"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users, projects, roles and comments with bulk inserts, for benchmarks. "
+        "The same --seed and --prefix give the same data. Seeded rows are indexed for search but not "
+        "written to the change log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=500)
+        parser.add_argument("--members", type=int, default=5, help="Members per project, owner included.")
+        parser.add_argument("--comments", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed", help="Prefix of the seeded usernames and emails.")
+        parser.add_argument("--password", default="password123", help="Password of every seeded user.")
+        parser.add_argument("--no-search-index", action="store_true", help="Skip indexing comments for search.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["members"] < 1:
+            raise CommandError("--users and --members must be at least 1.")
+        prefix = options["prefix"]
+        if CustomUser.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Users prefixed '{prefix}_' already exist; pick another --prefix.")
+
+        # The prefix is part of the seed, so another prefix gets other ids
+        self.rng = random.Random(f"{prefix}:{options['seed']}")
+        self.batch_size = options["batch_size"]
+
+        password = make_password(options["password"])
+        user_ids = self.insert(CustomUser, "users", options["users"], lambda i: CustomUser(
+            id=self.uuid(), username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=password,
+        ))
+
+        # Each project's members, owner first
+        members_per_project = min(options["members"], len(user_ids))
+        memberships = [self.rng.sample(user_ids, members_per_project) for _ in range(options["projects"])]
+        project_ids = self.insert(Project, "projects", options["projects"], lambda i: Project(
+            id=self.uuid(), name=f"{self.phrase(2, 4).title()} {i}", description=self.phrase(5, 20),
+            owner_id=memberships[i][0], member_count=members_per_project,
+        ), index=lambda projects: [search.index_project(project) for project in projects])
+
+        roles = [(project_id, user_id, "owner" if n == 0 else self.rng.choice(["editor", "reader"]))
+                 for project_id, members in zip(project_ids, memberships) for n, user_id in enumerate(members)]
+        self.insert(ProjectUserRole, "roles", len(roles), lambda i: ProjectUserRole(
+            id=self.uuid(), project_id=roles[i][0], user_id=roles[i][1], role=roles[i][2],
+        ))
+
+        if project_ids:
+            def comment(i):
+                # Skewed towards the first projects, so some projects are hot
+                n = int(len(project_ids) * self.rng.random() ** 2)
+                return Comment(id=self.uuid(), project_id=project_ids[n], author_id=self.rng.choice(memberships[n]),
+                               text=self.phrase(8, 30))
+            index = None if options["no_search_index"] else search.index_comments
+            self.insert(Comment, "comments", options["comments"], comment, index=index, keep_ids=False)
+
+            call_command("recompute_project_counters", batch_size=self.batch_size, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def phrase(self, low, high):
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def insert(self, model, label, count, build, index=None, keep_ids=True):
+        """
+        Bulk insert `count` rows built by build(i), one transaction per batch.
+        Returns their ids, unless keep_ids is off (for row counts that would not fit in memory).
+        """
+        ids, inserted = [], 0
+        rows = (build(i) for i in range(count))
+        while batch := list(islice(rows, self.batch_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if index:
+                    index(batch)
+            if keep_ids:
+                ids.extend(obj.pk for obj in batch)
+            inserted += len(batch)
+            self.stdout.write(f"{label.capitalize()}: {inserted}/{count}")
+        return ids
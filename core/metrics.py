@@ -0,0 +1,241 @@
+"""
+Per-request instrumentation, exposed in the Prometheus text format at /metrics.
+
+MetricsMiddleware tags each request with its view and action (e.g.
+`ProjectViewSet.list`) and records its latency, SQL query count, time spent
+in the database and time spent serializing into in-process histograms. Each
+worker process keeps its own; Prometheus sums them when it scrapes every worker.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """What one request spent, filled in by record_query() and timed_serialization()."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.statements = Counter()
+        self._timing = False
+
+    def nplusone(self):
+        """Return (count, sql) of the most repeated SELECT if it reaches METRICS_NPLUSONE_THRESHOLD, else None."""
+        selects = [(count, sql) for sql, count in self.statements.items() if sql.lstrip().upper().startswith("SELECT")]
+        if selects:
+            count, sql = max(selects)
+            if count >= getattr(settings, "METRICS_NPLUSONE_THRESHOLD", 5):
+                return count, sql
+        return None
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every connection (see core.signals)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - start
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+@contextmanager
+def timed_serialization():
+    """Count the block as serializer time; nested blocks are counted once."""
+    metrics = _current.get()
+    if metrics is None or metrics._timing:
+        yield
+        return
+    metrics._timing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_seconds += time.perf_counter() - start
+        metrics._timing = False
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket{_labels(labels, le=_number(bound))} {count}"
+            yield f"{self.name}_bucket{_labels(labels, le='+Inf')} {series[-1]}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(labels)} {series[-1]}"
+
+
+class CounterMetric:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+
+    def inc(self, labels):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{_labels(labels)} {value}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = CounterMetric("http_requests_total", "Requests by view action and status code.")
+            self.latency = Histogram("http_request_duration_seconds", "Time to build the response.", SECONDS_BUCKETS)
+            self.queries = Histogram("http_request_db_queries", "SQL queries per request.", QUERY_BUCKETS)
+            self.db_time = Histogram("http_request_db_seconds", "Time spent in SQL queries.", SECONDS_BUCKETS)
+            self.serializer_time = Histogram(
+                "http_request_serializer_seconds", "Time spent serializing objects.", SECONDS_BUCKETS
+            )
+            self.nplusone = CounterMetric("http_request_nplusone_total", "Requests that repeated one SELECT.")
+
+    def record(self, endpoint, status_code, seconds, metrics):
+        labels = (("endpoint", endpoint),)
+        with self._lock:
+            self.requests.inc(labels + (("status", status_code),))
+            self.latency.observe(labels, seconds)
+            self.queries.observe(labels, metrics.queries)
+            self.db_time.observe(labels, metrics.db_seconds)
+            self.serializer_time.observe(labels, metrics.serializer_seconds)
+            if metrics.nplusone():
+                self.nplusone.inc(labels)
+
+    def render(self):
+        with self._lock:
+            lines = [
+                line
+                for metric in (self.requests, self.latency, self.queries, self.db_time, self.serializer_time,
+                               self.nplusone)
+                for line in metric.render()
+            ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def endpoint_name(request, view_func):
+    """`View.action` for DRF viewsets, `View.method` for other class-based views, else the function name."""
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    if view_class is None:
+        return getattr(view_func, "__name__", "unknown")
+    method = request.method.lower()
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class MetricsMiddleware:
+    """
+    Record every request into the registry.
+    - Requests that match no view are recorded as `unmatched`.
+    - With METRICS_NPLUSONE_HEADER (on when DEBUG), a response whose request
+      ran one SELECT METRICS_NPLUSONE_THRESHOLD times or more gets an
+      `X-Query-Warning` header naming it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_endpoint = endpoint_name(request, view_func)
+
+    @staticmethod
+    def start():
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    @staticmethod
+    def finish(request, response, metrics, start):
+        endpoint = getattr(request, "metrics_endpoint", "unmatched")
+        registry.record(endpoint, response.status_code, time.perf_counter() - start, metrics)
+        if getattr(settings, "METRICS_NPLUSONE_HEADER", settings.DEBUG):
+            repeated = metrics.nplusone()
+            if repeated:
+                count, sql = repeated
+                sql = re.sub(r"\s+", " ", sql)[:200]
+                response["X-Query-Warning"] = f"N+1: {count}x {sql}"
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, open to METRICS_ALLOWED_IPS only (no one by default)."""
+    if request.META.get("REMOTE_ADDR") not in getattr(settings, "METRICS_ALLOWED_IPS", ()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
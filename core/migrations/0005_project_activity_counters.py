@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Project = apps.get_model("core", "Project")
+    Comment = apps.get_model("core", "Comment")
+    ProjectUserRole = apps.get_model("core", "ProjectUserRole")
+
+    def count(model):
+        rows = model.objects.filter(project=OuterRef("pk")).order_by().values("project")
+        return Coalesce(Subquery(rows.annotate(n=Count("pk")).values("n")), 0)
+
+    Project.objects.update(
+        comment_count=count(Comment),
+        member_count=count(ProjectUserRole),
+        last_comment_at=Subquery(
+            Comment.objects.filter(project=OuterRef("pk")).order_by("-created_at").values("created_at")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# SQLite: an FTS5 table whose rowid is the id of a plain entry table, which maps
+# it to the indexed object and its project.
+SQLITE_CREATE = [
+    """
+    CREATE TABLE core_search_entry (
+        id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+        kind varchar(16) NOT NULL,
+        object_id char(32) NOT NULL,
+        project_id char(32) NOT NULL,
+        UNIQUE (kind, object_id)
+    )
+    """,
+    "CREATE INDEX core_search_entry_project_idx ON core_search_entry (project_id)",
+    "CREATE VIRTUAL TABLE core_search_fts USING fts5(title, body, tokenize='porter unicode61')",
+    """
+    INSERT INTO core_search_entry (kind, object_id, project_id)
+    SELECT 'project', id, id FROM core_project
+    """,
+    """
+    INSERT INTO core_search_entry (kind, object_id, project_id)
+    SELECT 'comment', id, project_id FROM core_comment
+    """,
+    """
+    INSERT INTO core_search_fts (rowid, title, body)
+    SELECT e.id, p.name, p.description FROM core_search_entry e
+    JOIN core_project p ON e.kind = 'project' AND p.id = e.object_id
+    """,
+    """
+    INSERT INTO core_search_fts (rowid, title, body)
+    SELECT e.id, '', c.text FROM core_search_entry e
+    JOIN core_comment c ON e.kind = 'comment' AND c.id = e.object_id
+    """,
+]
+SQLITE_DROP = ["DROP TABLE core_search_fts", "DROP TABLE core_search_entry"]
+
+# PostgreSQL: one table with a generated, weighted tsvector under a GIN index.
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE core_search_entry (
+        kind varchar(16) NOT NULL,
+        object_id uuid NOT NULL,
+        project_id uuid NOT NULL,
+        title text NOT NULL,
+        body text NOT NULL,
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')
+        ) STORED,
+        PRIMARY KEY (kind, object_id)
+    )
+    """,
+    "CREATE INDEX core_search_entry_document_idx ON core_search_entry USING GIN (document)",
+    "CREATE INDEX core_search_entry_project_idx ON core_search_entry (project_id)",
+    """
+    INSERT INTO core_search_entry (kind, object_id, project_id, title, body)
+    SELECT 'project', id, id, name, description FROM core_project
+    """,
+    """
+    INSERT INTO core_search_entry (kind, object_id, project_id, title, body)
+    SELECT 'comment', id, project_id, '', text FROM core_comment
+    """,
+]
+POSTGRES_DROP = ["DROP TABLE core_search_entry"]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_project_activity_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}),
+            run({"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}),
+        ),
+    ]
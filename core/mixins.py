@@ -0,0 +1,120 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.db_routing import _read_alias, is_sticky, mark_sticky, replica_alias
+from core.roles import get_role_resolver
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from the read replica, once the caller is known.
+    - A successful write marks the caller sticky, and their reads stay on the
+      primary for REPLICA_STICKY_SECONDS so they see their own writes.
+    - Without REPLICA_DATABASE_ALIAS every request uses the primary.
+    - `read_actions` names actions that only read despite an unsafe method
+      (e.g. a query in a POST body); they never mark the caller sticky.
+    """
+    read_actions = []
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        alias = replica_alias()
+        if alias and request.method in SAFE_METHODS and not is_sticky(request.user.pk):
+            _read_alias.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and getattr(self, "action", None) not in self.read_actions \
+                and response.status_code < 400 and request.user.is_authenticated:
+            mark_sticky(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Serve the list action from `.values()` rows through `values_serializer_class`
+    rather than the DRF serializer. The JSON is identical either way; the
+    FAST_LIST_SERIALIZATION setting switches the fast path off.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None or not getattr(settings, "FAST_LIST_SERIALIZATION", True):
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class
+        rows = self.filter_queryset(self.get_queryset()).values(*serializer.lookups())
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET (ETag / Last-Modified) for the list and retrieve actions.
+    - list: the ETag comes from one aggregate over the filtered queryset, the
+      latest `updated_at` and the row count, so a 304 costs that query only.
+      Lists get no Last-Modified: a deletion or a revoked role shrinks a list
+      without moving its latest `updated_at`, and If-Modified-Since would miss it.
+    - retrieve: the validators come from the fetched object, after the
+      permission checks, so a 304 skips the serializer.
+    The ETag also covers the caller, their role version and the query string,
+    since those change what the response contains.
+    """
+    updated_field = "updated_at"
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = queryset.order_by().aggregate(last_modified=Max(self.updated_field), count=Count("pk"))
+        etag = self.get_etag(request, validators["last_modified"], validators["count"])
+        return self.conditional_response(
+            request, etag, None, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.updated_field)
+        etag = self.get_etag(request, last_modified, instance.pk)
+        return self.conditional_response(
+            request, etag, last_modified, lambda: Response(self.get_serializer(instance).data)
+        )
+
+    def get_etag(self, request, last_modified, *parts):
+        key = "|".join(str(part) for part in (
+            type(self).__name__,
+            request.user.pk,
+            get_role_resolver(request).version,
+            request.get_full_path(),
+            request.accepted_media_type,
+            last_modified.isoformat() if last_modified else "",
+            *parts,
+        ))
+        return 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+    def conditional_response(self, request, etag, last_modified, get_response):
+        # HTTP dates have one-second resolution
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = get_response()
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+        return response
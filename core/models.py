@@ -1,6 +1,41 @@
 import uuid
 from accounts.models import CustomUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+
+class LiveManager(models.Manager):
+    """
+    Default manager that hides soft-deleted projects, or with `deleted_field`
+    the comments and roles of soft-deleted projects. `all_objects` sees them.
+    """
+    deleted_field = "deleted_at"
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{f"{self.deleted_field}__isnull": True})
+
+
+class ProjectChildManager(LiveManager):
+    deleted_field = "project__deleted_at"
+
+
+class ProjectQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Projects the user is a member of, as an EXISTS semi-join (no DISTINCT needed)."""
+        return self.filter(
+            Exists(ProjectUserRole.all_objects.filter(project=OuterRef("pk"), user=user))
+        )
+
+    def with_role(self, user):
+        """Annotate each project with the user's role in it as `my_role`."""
+        return self.annotate(
+            my_role=Subquery(
+                ProjectUserRole.all_objects.filter(project=OuterRef("pk"), user=user).values("role")[:1]
+            )
+        )
+
 
 class Project(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -8,6 +43,24 @@ class Project(models.Model):
     description = models.TextField(blank=True)
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="owned_projects")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Denormalized activity summary, maintained by core.counters
+    comment_count = models.PositiveIntegerField(default=0)
+    last_comment_at = models.DateTimeField(null=True, blank=True)
+    member_count = models.PositiveIntegerField(default=0)
+
+    # Set when the project is deleted; purge_deleted_projects removes it later
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager.from_queryset(ProjectQuerySet)()
+    all_objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="project_created_id_idx"),
+            models.Index(fields=["deleted_at"], condition=Q(deleted_at__isnull=False), name="project_deleted_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -23,15 +76,99 @@ class ProjectUserRole(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="members")
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
 
+    objects = ProjectChildManager()
+    all_objects = models.Manager()
+
     class Meta:
         unique_together = ("user", "project")
 
     def __str__(self):
         return f"{self.user.email} - {self.role} in {self.project.name}"
 
+class CommentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Comments on projects the user is a member of, as one EXISTS subquery."""
+        return self.filter(
+            Exists(ProjectUserRole.all_objects.filter(project=OuterRef("project_id"), user=user))
+        )
+
+
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="comments")
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProjectChildManager.from_queryset(CommentQuerySet)()
+    all_objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="comment_created_id_idx"),
+            models.Index(fields=["project", "created_at", "id"], name="comment_project_created_idx"),
+            models.Index(fields=["project", "updated_at"], name="comment_project_updated_idx"),
+        ]
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of writes to projects, comments and roles, served by the
+    changes feed. The id is the feed's cursor; see core.changes.
+    """
+    KIND_CHOICES = [
+        ("project", "Project"),
+        ("comment", "Comment"),
+        ("role", "Role"),
+    ]
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.UUIDField()
+    # Plain ids rather than foreign keys: entries outlive what they describe
+    project_id = models.UUIDField()
+    user_id = models.UUIDField(null=True, blank=True)  # role entries: whose role it is
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project_id", "id"], name="changelog_project_idx"),
+            models.Index(fields=["user_id", "id"], name="changelog_user_idx"),
+        ]
+
+
+class Task(models.Model):
+    """
+    A queued call of a background task, run by the run_tasks worker; see
+    core.tasks. Rows are deleted once their task succeeds.
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("failed", "Failed"),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=255)  # dotted path of the task function
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    key = models.CharField(max_length=255, null=True, blank=True)  # idempotency key
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)  # lease of the worker running it
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="task_due_idx"),
+        ]
+        constraints = [
+            # One queued task per key: enqueueing it again while it waits is a no-op
+            models.UniqueConstraint(fields=["key"], condition=Q(status="queued"), name="task_queued_key_uniq"),
+        ]
@@ -0,0 +1,156 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+ERROR_INVALID_CURSOR = "Invalid cursor."
+
+
+class BoundedLimitOffsetPagination(LimitOffsetPagination):
+    """LimitOffsetPagination with the same cap on `?limit=` as on `?page_size=`."""
+    max_limit = 200
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination:
+    - Pages are ordered on `cursor_ordering` of the view, (-created_at, -id) by default.
+    - The cursor holds the ordering values of the last row served, and the next
+      page is a range condition on them, so every page costs the same index
+      range scan however deep it is.
+    - Offset pagination stays available as an opt-in with `?limit=` / `?offset=`.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    offset_pagination_class = BoundedLimitOffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.offset_paginator = None
+
+        if self.wants_offset_pagination(request):
+            ordering = tuple(getattr(view, "cursor_ordering", self.ordering))
+            self.offset_paginator = self.offset_pagination_class()
+            return self.offset_paginator.paginate_queryset(queryset.order_by(*ordering), request, view)
+
+        return self.paginate_rows(list(self.page_queryset(queryset, request, view)))
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        Return the unevaluated queryset of the page, one row more than the page
+        size; pass the fetched rows to paginate_rows(). Async views use this
+        pair directly, with keyset pages only.
+        """
+        self.request = request
+        self.offset_paginator = None
+        self.ordering = tuple(getattr(view, "cursor_ordering", self.ordering))
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.keyset_filter(self.ordering, cursor))
+        return queryset[:self.page_size + 1]
+
+    def paginate_rows(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = self.row_position(results[-1]) if self.has_next else None
+        return results
+
+    def wants_offset_pagination(self, request):
+        params = request.query_params
+        return self.offset_pagination_class.limit_query_param in params or \
+            self.offset_pagination_class.offset_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    @staticmethod
+    def keyset_filter(ordering, cursor):
+        """
+        Build the "rows after the cursor" condition for a multi-column ordering,
+        e.g. for (-created_at, -id):
+            created_at <= c AND (created_at < c OR (created_at = c AND id < i))
+        The leading inclusive bound lets the database use the composite index
+        as a range scan.
+        """
+        fields = [(name.lstrip("-"), "lt" if name.startswith("-") else "gt") for name in ordering]
+
+        after = Q()
+        for i, (name, lookup) in enumerate(fields):
+            equal = {prev_name: cursor[j] for j, (prev_name, _) in enumerate(fields[:i])}
+            after |= Q(**equal, **{f"{name}__{lookup}": cursor[i]})
+
+        leading_name, leading_lookup = fields[0]
+        return Q(**{f"{leading_name}__{leading_lookup}e": cursor[0]}) & after
+
+    def row_position(self, row):
+        names = [name.lstrip("-") for name in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def encode_cursor(self, position):
+        payload = json.dumps([
+            value.isoformat() if hasattr(value, "isoformat") else str(value) for value in position
+        ]).encode()
+        cursor = base64.urlsafe_b64encode(payload).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error, DjangoValidationError):
+            raise NotFound(ERROR_INVALID_CURSOR)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,32 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.mediatypes import parse_header_parameters
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes with orjson when it is installed, falling back to
+    the stdlib decoder otherwise or for bodies that are not UTF-8.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if orjson is None or not self.is_utf8(media_type, parser_context):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+    @staticmethod
+    def is_utf8(media_type, parser_context):
+        charset = parse_header_parameters(media_type or "")[1].get("charset")
+        if charset is None:
+            charset = parser_context.get("encoding") or "utf-8"
+        return charset.lower().replace("_", "-") in ("utf-8", "utf8")
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
 from core.models import ProjectUserRole, Comment, Project
+from core.roles import get_role_resolver
 
 class IsOwnerOrEditorOrReader(BasePermission):
     """
@@ -12,29 +13,44 @@ class IsOwnerOrEditorOrReader(BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
+        project_id = self.project_id(obj)
+        user_role = get_role_resolver(request).role_for(project_id) if project_id else None
+        return self.role_allows(request, obj, user_role)
+
+    async def ahas_object_permission(self, request, view, obj):
+        project_id = self.project_id(obj)
+        user_role = await get_role_resolver(request).arole_for(project_id) if project_id else None
+        return self.role_allows(request, obj, user_role)
+
+    @staticmethod
+    def project_id(obj):
+        if isinstance(obj, Comment):
+            return obj.project_id
+        if isinstance(obj, Project):
+            return obj.pk
+        return None
+
+    def role_allows(self, request, obj, user_role):
         """
         - Owners & Editors can create/edit/delete comments.
         - Owners, Editors, and Readers can view comments.
         - Owners & Editors can modify projects.
         - Readers can only view projects.
         """
-        # If the object is a Comment get the related project
+        # If the object is a Comment check the role in the related project
         if isinstance(obj, Comment):
-            project = obj.project
-            user_role = project.members.filter(user=request.user).first()
             if not user_role:
                 return False  # No role, no access
 
             # Ownrs & Editors can create/edit/delete comments
             if request.method in ["POST", "PUT", "PATCH", "DELETE"]:
-                return user_role.role in ["owner", "editor"]
+                return user_role in ["owner", "editor"]
 
             # Owners, Editors, and Readers can view comments
-            return user_role.role in ["owner", "editor", "reader"]
+            return user_role in ["owner", "editor", "reader"]
 
         # If it is a Project, allow Readrs to view, but prevent modifications
         if isinstance(obj, Project):
-            user_role = obj.members.filter(user=request.user).first()
             if not user_role:
                 return False  # No role, no access
 
@@ -43,7 +59,7 @@ class IsOwnerOrEditorOrReader(BasePermission):
                 return True  # Readers can read project details
 
             # Owners & Editors can modify the project but Readers cannot
-            return user_role.role in ["owner", "editor"]
+            return user_role in ["owner", "editor"]
 
         return False  # Default deny
 
@@ -59,6 +75,9 @@ class IsOwner(BasePermission):
         - Editors & Readers cannot perform these actions.
         """
         # Check if obj is a Project or ProjectUserRole
-        project = obj.project if isinstance(obj, ProjectUserRole) else obj
-        user_role = project.members.filter(user=request.user).first()
-        return user_role and user_role.role == "owner"
+        project_id = obj.project_id if isinstance(obj, ProjectUserRole) else obj.pk
+        return get_role_resolver(request).role_for(project_id) == "owner"
+
+    async def ahas_object_permission(self, request, view, obj):
+        project_id = obj.project_id if isinstance(obj, ProjectUserRole) else obj.pk
+        return await get_role_resolver(request).arole_for(project_id) == "owner"
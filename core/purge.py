@@ -0,0 +1,77 @@
+"""
+Soft delete of projects, and the purge that removes them for good.
+
+Deleting a project only stamps its deleted_at: from then on the default
+managers hide it, with its comments and roles (`all_objects` still sees
+them). The purge_deleted_projects command removes the rows later, a batch per
+transaction with raw DELETEs that skip the ORM's cascade collector and its
+per-row signals, so no request holds a write transaction over a big project.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core import changes, search
+from core.models import Comment, Project, ProjectUserRole
+from core.roles import invalidate_user_roles
+
+
+def soft_delete(project):
+    """Mark the project deleted, log its tombstone and drop it from search and the role caches."""
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(deleted_at=timezone.now())
+        changes.record(changes.PROJECT, changes.DELETED, project)
+        search.unindex(search.PROJECT, [project.pk])
+        members = ProjectUserRole.all_objects.filter(project=project).values_list("user_id", flat=True)
+        for user_id in members.iterator():
+            invalidate_user_roles(user_id)
+
+
+def deleted_projects():
+    """Soft-deleted projects still to purge, oldest deletion first."""
+    return Project.all_objects.filter(deleted_at__isnull=False).order_by("deleted_at", "pk")
+
+
+def purge_comments(project_id, batch_size):
+    """Delete up to `batch_size` comments of the project; returns how many were deleted."""
+    with transaction.atomic():
+        ids = list(Comment.all_objects.filter(project_id=project_id).values_list("pk", flat=True)[:batch_size])
+        if ids:
+            search.unindex(search.COMMENT, ids)
+            Comment.all_objects.filter(pk__in=ids)._raw_delete(Comment.all_objects.db)
+    return len(ids)
+
+
+def purge_roles(project_id, batch_size):
+    """
+    Delete up to `batch_size` roles of the project; returns how many were deleted.
+    The removals are logged, so former members learn from the changes feed.
+    """
+    with transaction.atomic():
+        roles = list(ProjectUserRole.all_objects.filter(project_id=project_id).only("user_id", "project_id")[:batch_size])
+        if roles:
+            ProjectUserRole.all_objects.filter(pk__in=[role.pk for role in roles])._raw_delete(
+                ProjectUserRole.all_objects.db
+            )
+            changes.record_many(changes.ROLE, changes.DELETED, roles)
+            for role in roles:
+                invalidate_user_roles(role.user_id)
+    return len(roles)
+
+
+def purge_project(project, batch_size, progress=None):
+    """
+    Delete a soft-deleted project's comments, then its roles, `batch_size` rows
+    per transaction, then the project itself.
+    - progress(label, deleted), if given, is called after every batch with
+      the running count of comments or roles deleted.
+    - Safe to interrupt: a later call carries on where this one stopped.
+    """
+    for label, purge in (("comments", purge_comments), ("roles", purge_roles)):
+        deleted = 0
+        while count := purge(project.pk, batch_size):
+            deleted += count
+            if progress:
+                progress(label, deleted)
+
+    # Its tombstone was logged and its search entry removed by soft_delete()
+    Project.all_objects.filter(pk=project.pk, deleted_at__isnull=False)._raw_delete(Project.all_objects.db)
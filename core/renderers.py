@@ -0,0 +1,75 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, falling back to
+    the stdlib encoder otherwise.
+    - orjson handles UUIDs, datetimes and dates natively; anything else goes
+      through DRF's JSONEncoder, so the output matches JSONRenderer byte for byte.
+    - Indented output and non-default JSON settings use the stdlib path.
+    """
+    orjson_options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which the stdlib encoder accepts
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict javascript subset escaping as JSONRenderer
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class StreamRenderer(BaseRenderer):
+    """
+    Renderer for endpoints that stream their body themselves.
+    Selecting it lets content negotiation accept the media type; only error
+    responses ever go through render(), and those are encoded as JSON.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+class NDJSONRenderer(StreamRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(StreamRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class EventStreamRenderer(FastJSONRenderer):
+    """
+    Renders one server-sent event: `data` as a line of JSON, preceded by the
+    optional `event` name and `id` from the renderer context.
+    """
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        fields = [
+            f"{name}: {renderer_context[name]}\n".encode()
+            for name in ("id", "event") if renderer_context.get(name) is not None
+        ]
+        return b"".join(fields) + b"data: " + super().render(data, "application/json") + b"\n\n"
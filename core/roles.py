@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.models import ProjectUserRole
+
+# Stored in the shared cache for "no role", so non-members are cached too
+NO_ROLE = ""
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _role_cache():
+    return caches[getattr(settings, "ROLE_CACHE_ALIAS", "default")]
+
+
+def _role_cache_timeout():
+    return getattr(settings, "ROLE_CACHE_TIMEOUT", 300)
+
+
+def _version_key(user_id):
+    return f"roles:version:{user_id}"
+
+
+def _role_key(user_id, version, project_id):
+    return f"roles:{user_id}:{version}:{project_id}"
+
+
+def _user_roles(user):
+    # Always the primary: a role read from a lagging replica would be cached
+    return ProjectUserRole.objects.using(DEFAULT_DB_ALIAS).filter(user=user)
+
+
+def _count(event, n=1):
+    with _stats_lock:
+        _stats[event] += n
+
+
+def role_cache_stats():
+    """Return the shared role cache hit/miss counters of this process."""
+    with _stats_lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"]}
+
+
+def reset_role_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_role_version(user_id):
+    """
+    Return the current role version of a user.
+    A missing version starts from the clock rather than 1, so entries written
+    under a version that was evicted can never be read again.
+    """
+    cache = _role_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+async def aget_role_version(user_id):
+    cache = _role_cache()
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), time.time_ns(), timeout=None)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+def _bump_role_version(user_id):
+    cache = _role_cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def invalidate_user_roles(user_id):
+    """
+    Invalidate every cached role of a user.
+    The version is bumped right away and again once the surrounding
+    transaction commits, so a concurrent reader cannot cache the old row
+    under the new version in between.
+    """
+    _bump_role_version(user_id)
+    transaction.on_commit(lambda: _bump_role_version(user_id))
+
+
+class RoleResolver:
+    """
+    Resolves the requesting user's role in each project.
+    - Roles are memoized for the lifetime of the request.
+    - Across requests, roles are read from the shared role cache, keyed by
+      (user, project) under the user's role version, before the database.
+    - `roles` loads the user's full project_id -> role map in one query, for
+      checks that span every project; roles_for() resolves a batch of
+      projects with one cache round trip and at most one IN query.
+    - aroles(), arole_for() and ahas_any_role() are the async variants, for
+      async views.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = {}
+        self._complete = False
+        self._version = None
+
+    @property
+    def authenticated(self):
+        return self.user is not None and self.user.is_authenticated
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = get_role_version(self.user.pk)
+        return self._version
+
+    @property
+    def roles(self):
+        """Return the user's full project_id -> role map."""
+        if not self._complete:
+            if self.authenticated:
+                self._roles = dict(_user_roles(self.user).values_list("project_id", "role"))
+            self._complete = True
+        return self._roles
+
+    def role_for(self, project_id):
+        """Return the user's role in the project, or None if they are not a member."""
+        if project_id in self._roles:
+            return self._roles[project_id]
+        if self._complete or not self.authenticated:
+            return None
+
+        cache = _role_cache()
+        key = _role_key(self.user.pk, self.version, project_id)
+        role = cache.get(key)
+        if role is None:
+            _count("misses")
+            role = _user_roles(self.user).filter(
+                project_id=project_id
+            ).values_list("role", flat=True).first() or NO_ROLE
+            cache.set(key, role, _role_cache_timeout())
+        else:
+            _count("hits")
+
+        self._roles[project_id] = role or None
+        return self._roles[project_id]
+
+    def roles_for(self, project_ids):
+        """Return {project_id: role or None} for a batch of projects."""
+        result = {project_id: self._roles[project_id] for project_id in project_ids if project_id in self._roles}
+        missing = [project_id for project_id in project_ids if project_id not in result]
+        if not missing or self._complete or not self.authenticated:
+            return {**dict.fromkeys(missing), **result}
+
+        cache = _role_cache()
+        keys = {_role_key(self.user.pk, self.version, project_id): project_id for project_id in missing}
+        cached = cache.get_many(keys)
+        _count("hits", len(cached))
+        _count("misses", len(keys) - len(cached))
+
+        uncached = [project_id for key, project_id in keys.items() if key not in cached]
+        found = dict(_user_roles(self.user).filter(project_id__in=uncached).values_list("project_id", "role")) \
+            if uncached else {}
+        cache.set_many({
+            key: found.get(project_id, NO_ROLE) for key, project_id in keys.items() if key not in cached
+        }, _role_cache_timeout())
+
+        for key, project_id in keys.items():
+            role = cached[key] if key in cached else found.get(project_id, NO_ROLE)
+            self._roles[project_id] = result[project_id] = role or None
+        return result
+
+    def has_any_role(self, *roles):
+        """Return True if the user holds one of the given roles in any project."""
+        return any(role in roles for role in self.roles.values())
+
+    async def aroles(self):
+        if not self._complete:
+            if self.authenticated:
+                self._roles = {
+                    project_id: role
+                    async for project_id, role in _user_roles(self.user).values_list("project_id", "role")
+                }
+            self._complete = True
+        return self._roles
+
+    async def arole_for(self, project_id):
+        if project_id in self._roles:
+            return self._roles[project_id]
+        if self._complete or not self.authenticated:
+            return None
+
+        if self._version is None:
+            self._version = await aget_role_version(self.user.pk)
+        cache = _role_cache()
+        key = _role_key(self.user.pk, self._version, project_id)
+        role = await cache.aget(key)
+        if role is None:
+            _count("misses")
+            role = await _user_roles(self.user).filter(
+                project_id=project_id
+            ).values_list("role", flat=True).afirst() or NO_ROLE
+            await cache.aset(key, role, _role_cache_timeout())
+        else:
+            _count("hits")
+
+        self._roles[project_id] = role or None
+        return self._roles[project_id]
+
+    async def ahas_any_role(self, *roles):
+        return any(role in roles for role in (await self.aroles()).values())
+
+    def remember(self, project_id, role):
+        """Record a role granted during this request so later checks see it."""
+        self._roles[project_id] = role
+
+    def forget(self, project_id):
+        """Drop a role revoked during this request."""
+        if self._complete:
+            self._roles.pop(project_id, None)
+        else:
+            self._roles[project_id] = None
+
+
+def get_role_resolver(request):
+    """Return the RoleResolver attached to the request, creating it on first use."""
+    resolver = getattr(request, "_role_resolver", None)
+    if resolver is None or resolver.user is not request.user:
+        resolver = RoleResolver(request.user)
+        request._role_resolver = resolver
+    return resolver
@@ -0,0 +1,182 @@
+"""
+Full-text search over project names and descriptions and comment texts.
+
+The index lives next to the models (see migration 0006_search_index): an FTS5
+table on SQLite, a tsvector column under a GIN index on PostgreSQL. It is
+kept in sync by the signals in core.signals, which index saved objects in a
+background task (see core.tasks) and unindex deleted ones right away, and by
+index_comments() on bulk paths that send no signals.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from core import tasks
+from core.models import Comment, Project
+
+PROJECT = "project"
+COMMENT = "comment"
+
+# The user's projects, leaving out deleted ones whose comments are not purged yet
+MEMBER_PROJECTS = (
+    "SELECT r.project_id FROM core_projectuserrole r JOIN core_project p ON p.id = r.project_id "
+    "WHERE r.user_id = %s AND p.deleted_at IS NULL"
+)
+
+
+class SQLiteSearchBackend:
+    def index(self, cursor, kind, object_id, project_id, title, body):
+        cursor.execute(
+            "INSERT INTO core_search_entry (kind, object_id, project_id) VALUES (%s, %s, %s) "
+            "ON CONFLICT (kind, object_id) DO UPDATE SET project_id = excluded.project_id RETURNING id",
+            [kind, object_id, project_id],
+        )
+        (rowid,) = cursor.fetchone()
+        cursor.execute("DELETE FROM core_search_fts WHERE rowid = %s", [rowid])
+        cursor.execute("INSERT INTO core_search_fts (rowid, title, body) VALUES (%s, %s, %s)", [rowid, title, body])
+
+    def remove(self, cursor, kind, object_ids):
+        placeholders = ", ".join(["%s"] * len(object_ids))
+        where = f"kind = %s AND object_id IN ({placeholders})"
+        cursor.execute(
+            f"DELETE FROM core_search_fts WHERE rowid IN (SELECT id FROM core_search_entry WHERE {where})",
+            [kind, *object_ids],
+        )
+        cursor.execute(f"DELETE FROM core_search_entry WHERE {where}", [kind, *object_ids])
+
+    @staticmethod
+    def match_expression(query):
+        """Every word of the query must match, the last one as a prefix."""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return None
+        return " ".join(f'"{word}"' for word in words) + "*"
+
+    def search(self, cursor, query, user_id, limit, offset):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        # bm25() is lower for better matches; titles weigh ten times the body
+        cursor.execute(
+            "SELECT e.kind, e.object_id, -bm25(core_search_fts, 10.0, 1.0) AS score "
+            "FROM core_search_fts JOIN core_search_entry e ON e.id = core_search_fts.rowid "
+            "WHERE core_search_fts MATCH %s "
+            f"AND e.project_id IN ({MEMBER_PROJECTS}) "
+            "ORDER BY bm25(core_search_fts, 10.0, 1.0), e.id LIMIT %s OFFSET %s",
+            [expression, user_id, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+class PostgresSearchBackend:
+    def index(self, cursor, kind, object_id, project_id, title, body):
+        cursor.execute(
+            "INSERT INTO core_search_entry (kind, object_id, project_id, title, body) VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT (kind, object_id) DO UPDATE SET "
+            "project_id = EXCLUDED.project_id, title = EXCLUDED.title, body = EXCLUDED.body",
+            [kind, object_id, project_id, title, body],
+        )
+
+    def remove(self, cursor, kind, object_ids):
+        placeholders = ", ".join(["%s"] * len(object_ids))
+        cursor.execute(
+            f"DELETE FROM core_search_entry WHERE kind = %s AND object_id IN ({placeholders})",
+            [kind, *object_ids],
+        )
+
+    def search(self, cursor, query, user_id, limit, offset):
+        cursor.execute(
+            "SELECT e.kind, e.object_id, ts_rank(e.document, q) AS score "
+            "FROM core_search_entry e, websearch_to_tsquery('english', %s) q "
+            "WHERE e.document @@ q "
+            f"AND e.project_id IN ({MEMBER_PROJECTS}) "
+            "ORDER BY score DESC, e.object_id LIMIT %s OFFSET %s",
+            [query, user_id, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend(),
+    "postgresql": PostgresSearchBackend(),
+}
+
+
+def _backend(connection):
+    try:
+        return BACKENDS[connection.vendor]
+    except KeyError:
+        raise ImproperlyConfigured(f"Search is not supported on {connection.vendor}.")
+
+
+def _indexed(connection):
+    # Other databases have no index table; writes there are not indexed
+    return connection.vendor in BACKENDS
+
+
+def _db_id(model, value, connection):
+    return model._meta.pk.get_db_prep_value(value, connection)
+
+
+def _index(kind, rows, using=DEFAULT_DB_ALIAS):
+    """Index (object, project id, title, body) rows of one kind."""
+    connection = connections[using]
+    if not _indexed(connection):
+        return
+    backend = _backend(connection)
+    with connection.cursor() as cursor:
+        for obj, project_id, title, body in rows:
+            backend.index(
+                cursor, kind, _db_id(type(obj), obj.pk, connection),
+                _db_id(Project, project_id, connection), title, body or "",
+            )
+
+
+def index_project(project):
+    _index(PROJECT, [(project, project.pk, project.name, project.description)])
+
+
+def index_comments(comments):
+    _index(COMMENT, [(comment, comment.project_id, "", comment.text) for comment in comments])
+
+
+def unindex(kind, object_ids, using=DEFAULT_DB_ALIAS):
+    object_ids = list(object_ids)
+    connection = connections[using]
+    if not object_ids or not _indexed(connection):
+        return
+    model = Project if kind == PROJECT else Comment
+    with connection.cursor() as cursor:
+        _backend(connection).remove(cursor, kind, [_db_id(model, pk, connection) for pk in object_ids])
+
+
+@tasks.task
+def reindex(kind, object_id):
+    """Index a project or comment as it is now, or unindex it once it is gone (or its project is)."""
+    obj = (Project if kind == PROJECT else Comment).objects.filter(pk=object_id).first()
+    if obj is None:
+        unindex(kind, [object_id])
+    elif kind == PROJECT:
+        index_project(obj)
+    else:
+        index_comments([obj])
+
+
+def index_later(kind, object_id):
+    """Queue reindex() once the write commits; repeated writes share a queued reindex."""
+    tasks.enqueue(reindex, key=f"search:{kind}:{object_id}", kind=kind, object_id=object_id)
+
+
+def search(user, query, limit, offset=0):
+    """
+    Return (kind, object id, score) hits for the query, best first, limited to
+    projects the user is a member of and the comments on them.
+    """
+    connection = connections[router.db_for_read(Comment)]
+    with connection.cursor() as cursor:
+        rows = _backend(connection).search(
+            cursor, query, _db_id(type(user), user.pk, connection), limit, offset
+        )
+    pk_field = Comment._meta.pk
+    return [(kind, pk_field.to_python(object_id), score) for kind, object_id, score in rows]
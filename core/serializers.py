@@ -1,21 +1,148 @@
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+from .metrics import timed_serialization
 from .models import Project, Comment, ProjectUserRole
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """Count to_representation() as serializer time in the request metrics."""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = '__all__'
+        read_only_fields = ['author']
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.StringRelatedField(read_only=True)
+    # Only present when the queryset is annotated with ProjectQuerySet.with_role()
+    my_role = serializers.CharField(read_only=True)
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'owner', 'created_at']
-        read_only_fields = ['id', 'created_at', 'owner']
+        fields = ['id', 'name', 'description', 'owner', 'created_at', 'updated_at',
+                  'comment_count', 'last_comment_at', 'member_count', 'my_role']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'owner',
+                            'comment_count', 'last_comment_at', 'member_count']
 
 
-class ProjectUserRoleSerializer(serializers.ModelSerializer):
+class ProjectUserRoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ProjectUserRole
         fields = '__all__'
+
+
+class RoleAssignmentSerializer(serializers.Serializer):
+    user = serializers.UUIDField()
+    role = serializers.ChoiceField(choices=ProjectUserRole.ROLE_CHOICES)
+
+
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    """Assign roles in one project to many users at once."""
+    MAX_ASSIGNMENTS = 5000
+
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    roles = RoleAssignmentSerializer(many=True, allow_empty=False, max_length=MAX_ASSIGNMENTS)
+
+
+class ProjectAccessSerializer(serializers.Serializer):
+    """A batch of project ids to look the caller's roles up for."""
+    MAX_PROJECTS = 1000
+
+    projects = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_PROJECTS)
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for list endpoints, producing the same representation
+    as `serializer_class` straight from `.values()` rows:
+    - The columns and their encoders are worked out from the serializer's
+      fields, once per column, instead of running DRF fields per row.
+    - Fields without a plain column (e.g. StringRelatedField) must be mapped
+      to a `.values()` lookup in `overrides`.
+    """
+    serializer_class = None
+    overrides = {}
+
+    _columns = None
+
+    @classmethod
+    def columns(cls):
+        """Return (output name, values() lookup, field) for every readable field."""
+        if cls.__dict__.get("_columns") is None:
+            columns = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if name in cls.overrides:
+                    columns.append((name, cls.overrides[name], None))
+                elif isinstance(field, serializers.StringRelatedField):
+                    raise TypeError(f"{cls.__name__} needs an override for the string field '{name}'.")
+                else:
+                    columns.append((name, field.source, field))
+            cls._columns = columns
+        return cls._columns
+
+    @classmethod
+    def lookups(cls):
+        return [lookup for _, lookup, _ in cls.columns()]
+
+    @staticmethod
+    def encoder(field):
+        """Return a function encoding one value of the field's column, or None to keep values as they are."""
+        if field is None or isinstance(field, (serializers.CharField, serializers.IntegerField,
+                                               serializers.ChoiceField, serializers.BooleanField)):
+            return None
+
+        if isinstance(field, (serializers.UUIDField, serializers.PrimaryKeyRelatedField)) and \
+                getattr(field, "uuid_format", "hex_verbose") == "hex_verbose":
+            return str
+
+        if isinstance(field, serializers.DateTimeField) and \
+                getattr(field, "format", api_settings.DATETIME_FORMAT).lower() == ISO_8601:
+            tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+            def encode_datetime(value):
+                value = value.astimezone(tz).isoformat() if tz else value.isoformat()
+                return value[:-6] + "Z" if value.endswith("+00:00") else value
+            return encode_datetime
+
+        return field.to_representation
+
+    @classmethod
+    def serialize(cls, rows):
+        """Serialize `.values()` rows (dicts keyed by lookups()) into representation dicts."""
+        rows = list(rows)
+        with timed_serialization():
+            return cls._serialize(rows)
+
+    @classmethod
+    def _serialize(cls, rows):
+        names, columns = [], []
+        for name, lookup, field in cls.columns():
+            values = [row[lookup] for row in rows]
+            encode = cls.encoder(field)
+            if encode is not None:
+                values = [None if value is None else encode(value) for value in values]
+            names.append(name)
+            columns.append(values)
+        return [dict(zip(names, values)) for values in zip(*columns)] if columns else []
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    serializer_class = CommentSerializer
+
+
+class ProjectValuesSerializer(ValuesSerializer):
+    serializer_class = ProjectSerializer
+    # CustomUser.__str__ is the email
+    overrides = {"owner": "owner__email"}
+
+
+class ProjectUserRoleValuesSerializer(ValuesSerializer):
+    serializer_class = ProjectUserRoleSerializer
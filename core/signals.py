@@ -0,0 +1,61 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import changes, events, metrics, search
+from core.models import Comment, Project, ProjectUserRole
+from core.roles import invalidate_user_roles
+
+CHANGE_KINDS = {Project: changes.PROJECT, Comment: changes.COMMENT, ProjectUserRole: changes.ROLE}
+
+
+@receiver(post_save, sender=ProjectUserRole)
+@receiver(post_delete, sender=ProjectUserRole)
+def invalidate_role_cache(sender, instance, **kwargs):
+    """Any write to a role row invalidates that user's cached roles."""
+    invalidate_user_roles(instance.user_id)
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, update_fields=None, **kwargs):
+    """Re-index a project when its name or description may have changed."""
+    if update_fields is None or {"name", "description"} & set(update_fields):
+        search.index_later(search.PROJECT, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"text", "project"} & set(update_fields):
+        search.index_later(search.COMMENT, instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Comment)
+def unindex_object(sender, instance, **kwargs):
+    search.unindex(search.PROJECT if sender is Project else search.COMMENT, [instance.pk])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=ProjectUserRole)
+def log_save(sender, instance, created, **kwargs):
+    """Append to the change log; the counters updated by core.counters are not logged."""
+    changes.record(CHANGE_KINDS[sender], changes.CREATED if created else changes.UPDATED, instance)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=ProjectUserRole)
+def log_delete(sender, instance, **kwargs):
+    changes.record(CHANGE_KINDS[sender], changes.DELETED, instance)
+
+
+@receiver(changes.logged)
+def publish_events(sender, entries, **kwargs):
+    events.get_broker().logged(entries)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Time every query for the request metrics (see core.metrics)."""
+    connection.execute_wrappers.append(metrics.record_query)
@@ -0,0 +1,111 @@
+"""
+Background tasks, for side effects that need not hold up the write that
+causes them. The queue is the Task table, so no broker is needed.
+
+- @task marks a function as a task; enqueue() schedules a call of it once
+  the surrounding transaction commits. Arguments go through JSON.
+- A key makes the call idempotent while it waits: enqueueing a key that is
+  already queued is a no-op. Tasks recompute from the current state (a
+  project's counters, an object's index entry) rather than apply a delta, so
+  one run covers every write that enqueued it.
+- `python manage.py run_tasks` runs due tasks on a pool of processes. A task
+  that raises is retried after TASKS_BACKOFF_SECONDS, doubled at each
+  attempt, until TASKS_MAX_ATTEMPTS; it is then kept as failed, with its error.
+- A worker leases the tasks it claims for TASKS_LEASE_SECONDS; the tasks of
+  a worker that dies are run again once their lease expires.
+- With TASKS_EAGER, enqueue() runs the task right away instead, as in tests.
+"""
+import json
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Task
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+
+
+def task(func):
+    """Mark a module-level function as a task; the worker runs nothing else."""
+    func.is_task = True
+    return func
+
+
+def _name(func):
+    if not getattr(func, "is_task", False):
+        raise ImproperlyConfigured(f"{func.__qualname__} is not a task; decorate it with @task.")
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, key=None, **kwargs):
+    """Queue func(**kwargs) to run once the current transaction commits (right away outside one)."""
+    name = _name(func)
+    if getattr(settings, "TASKS_EAGER", False):
+        func(**json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder)))
+        return
+    # A queued task with the same key already covers this call
+    transaction.on_commit(lambda: Task.objects.bulk_create([Task(name=name, kwargs=kwargs, key=key)],
+                                                           ignore_conflicts=True))
+
+
+def backoff(attempts):
+    """Seconds to wait before the retry that follows the given number of attempts."""
+    return getattr(settings, "TASKS_BACKOFF_SECONDS", 10) * 2 ** (attempts - 1)
+
+
+def claim(limit):
+    """
+    Lease up to `limit` due tasks, oldest first, and return them: queued
+    tasks whose time has come, and running ones whose lease has expired.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Task.objects.filter(Q(status=QUEUED, run_at__lte=now) | Q(status=RUNNING, locked_until__lt=now))
+        ids = list(due.order_by("run_at", "id").select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+        if ids:
+            Task.objects.filter(pk__in=ids).update(
+                status=RUNNING,
+                attempts=F("attempts") + 1,
+                locked_until=now + timedelta(seconds=getattr(settings, "TASKS_LEASE_SECONDS", 300)),
+            )
+    return list(Task.objects.filter(pk__in=ids).order_by("run_at", "id"))
+
+
+def execute(name, kwargs):
+    """Run one task, in a worker process; returns None, or the traceback of its failure."""
+    try:
+        func = import_string(name)
+        _name(func)
+        func(**kwargs)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def finish(task, error):
+    """
+    Record the outcome of a claimed task: delete it on success, else queue
+    its retry after a backoff, or keep it as failed once out of attempts.
+    """
+    tasks = Task.objects.filter(pk=task.pk, status=RUNNING)
+    if error is None:
+        tasks.delete()
+    elif task.attempts >= getattr(settings, "TASKS_MAX_ATTEMPTS", 5):
+        tasks.update(status=FAILED, locked_until=None, last_error=error)
+    else:
+        try:
+            with transaction.atomic():
+                tasks.update(status=QUEUED, locked_until=None, last_error=error,
+                             run_at=timezone.now() + timedelta(seconds=backoff(task.attempts)))
+        except IntegrityError:
+            # The same key was queued again meanwhile, and that run will do
+            tasks.delete()
@@ -1,11 +1,50 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connection, connections
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from core.models import Project, ProjectUserRole
+from accounts.serializers import ClaimsTokenObtainPairSerializer
+from core import changes, counters, events, metrics, tasks
+from core.db_routing import ReplicaRouter
+from core.models import ChangeLogEntry, Project, ProjectUserRole, Comment, Task
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from core.serializers import CommentSerializer
+from core.roles import role_cache_stats, reset_role_cache_stats
 
 User = get_user_model()
 
+
+def run_tasks():
+    """Run the queued tasks in this process, as the run_tasks worker would."""
+    call_command("run_tasks", once=True, processes=0, stdout=io.StringIO(), stderr=io.StringIO())
+
+
+@tasks.task
+def failing_task(message):
+    """A task that always fails, for TaskQueueTest."""
+    raise RuntimeError(message)
+
 class ProjectRBACAPITest(TestCase):
     """Test Role-Based Access Control for Project API"""
 
@@ -93,3 +132,1576 @@ class ProjectRBACAPITest(TestCase):
         self.client.force_authenticate(user=self.owner)
         response = self.client.delete(f"/api/projects/{self.project.id}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+class RoleResolutionQueryCountTest(TestCase):
+    """Test that role checks hit the database once per request, whatever the endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.editor = User.objects.create_user(username="editor", email="editor@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Test Project", description="Project for testing", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.editor, project=self.project, role="editor")
+        self.comment = Comment.objects.create(project=self.project, author=self.editor, text="First")
+
+        # Extra memberships must not add queries: all roles load in one go
+        for i in range(5):
+            other = Project.objects.create(name=f"Other {i}", owner=self.owner)
+            ProjectUserRole.objects.create(user=self.editor, project=other, role="reader")
+
+        self.client.force_authenticate(user=self.editor)
+
+    def test_project_retrieve_queries(self):
+        """Fetching the project with its owner and the caller's role"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/projects/{self.project.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_project_update_queries(self):
+        """Fetching the project with its owner and the caller's role, then the update, its change log entry and queued reindex"""
+        data = {"name": "Updated Project", "description": "Updated by editor"}
+        with self.assertNumQueries(4), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/api/projects/{self.project.id}/", data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_project_create_queries(self):
+        """One role lookup, then the project and owner role inserts with their change log entries (in a savepoint), then the queued reindex"""
+        data = {"name": "New Project", "description": "Created by editor"}
+        with self.assertNumQueries(8), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/projects/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_comment_retrieve_queries(self):
+        """Fetching the comment, then one role lookup (no extra project fetch)"""
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/comments/{self.comment.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_comment_create_queries(self):
+        """Validating the project, one role lookup, then the insert, its change log entry and counter update, then the queued reindex"""
+        data = {"project": self.project.id, "text": "Second"}
+        with self.assertNumQueries(8), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_role_destroy_queries(self):
+        """Fetching the role, one role lookup, then the delete, its change log entry and counter update (in a savepoint)"""
+        role = ProjectUserRole.objects.get(user=self.editor, project=self.project)
+        self.client.force_authenticate(user=self.owner)
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/roles/{role.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+class RoleCacheTest(TestCase):
+    """Test the shared role cache and its invalidation"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Test Project", description="Project for testing", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        self.reader_role = ProjectUserRole.objects.create(user=self.reader, project=self.project, role="reader")
+        self.comment = Comment.objects.create(project=self.project, author=self.owner, text="First")
+
+        self.client.force_authenticate(user=self.reader)
+        reset_role_cache_stats()
+
+    def test_second_request_served_from_cache(self):
+        """The role lookup is skipped once the role is cached"""
+        with self.assertNumQueries(2):
+            self.client.get(f"/api/comments/{self.comment.id}/")
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/comments/{self.comment.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(role_cache_stats(), {"hits": 1, "misses": 1})
+
+    def test_role_revocation_takes_effect_immediately(self):
+        """Deleting a role invalidates the cached role"""
+        self.reader_role.role = "editor"
+        self.reader_role.save()
+        data = {"project": self.project.id, "text": "Second"}
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.reader_role.delete()
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_role_change_takes_effect_immediately(self):
+        """Promoting a reader invalidates the cached role"""
+        data = {"project": self.project.id, "text": "Second"}
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.reader_role.role = "editor"
+        self.reader_role.save()
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_destroy_endpoint_invalidates_cache(self):
+        """Removing a role through the API revokes access right away"""
+        self.reader_role.role = "editor"
+        self.reader_role.save()
+        data = {"project": self.project.id, "text": "Second"}
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.delete(f"/api/roles/{self.reader_role.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.post("/api/comments/", data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class KeysetPaginationTest(TestCase):
+    """Test cursor pagination of the list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", description="Project for testing", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+
+        self.comments = [
+            Comment.objects.create(project=self.project, author=self.owner, text=f"Comment {i}")
+            for i in range(7)
+        ]
+        # Give some comments the same timestamp so the id tie-breaker is exercised
+        Comment.objects.filter(pk__in=[c.pk for c in self.comments[2:5]]).update(
+            created_at=self.comments[2].created_at
+        )
+
+        self.client.force_authenticate(user=self.owner)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [item["id"] for item in response.data["results"]]
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_cursor_pages_cover_every_row_once(self):
+        """Following `next` returns every comment once, newest first"""
+        ids, pages = self.walk("/api/comments/?page_size=2")
+        expected = Comment.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+        self.assertEqual(pages, 4)
+
+    def test_deep_page_costs_the_same_queries(self):
+        """A page deep in the listing runs the same queries as the first page"""
+        first = self.client.get("/api/comments/?page_size=2")
+        with self.assertNumQueries(2):
+            self.client.get("/api/comments/?page_size=2")
+        with self.assertNumQueries(2):
+            response = self.client.get(first.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        """A tampered cursor is rejected"""
+        response = self.client.get("/api/comments/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_offset_pagination_opt_in(self):
+        """limit/offset switches to offset pagination"""
+        response = self.client.get("/api/comments/?limit=3&offset=3")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_offset_limit_is_capped(self):
+        """?limit= is capped at 200 rows, like ?page_size="""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/comments/?limit=100000")
+        self.assertEqual(len(response.data["results"]), 7)
+        self.assertIn("LIMIT 200", queries.captured_queries[-1]["sql"])
+
+    def test_projects_are_paginated(self):
+        """The project listing uses the same pagination"""
+        response = self.client.get("/api/projects/")
+        self.assertEqual([item["id"] for item in response.data["results"]], [str(self.project.id)])
+        self.assertIsNone(response.data["next"])
+
+class CommentScopingTest(TestCase):
+    """Test that comment listings only contain the caller's projects"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        self.other_project = Project.objects.create(name="Other Project", owner=self.owner)
+        self.private_project = Project.objects.create(name="Private Project", owner=self.outsider)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.owner, project=self.other_project, role="owner")
+        ProjectUserRole.objects.create(user=self.outsider, project=self.private_project, role="owner")
+
+        self.comment = Comment.objects.create(project=self.project, author=self.owner, text="Mine")
+        self.other_comment = Comment.objects.create(project=self.other_project, author=self.owner, text="Also mine")
+        self.private_comment = Comment.objects.create(project=self.private_project, author=self.outsider, text="Not mine")
+
+        self.client.force_authenticate(user=self.owner)
+
+    def test_list_only_contains_member_projects(self):
+        """Comments on projects the caller is not a member of are not listed"""
+        # The conditional GET validators, then the page
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/comments/")
+        ids = {item["id"] for item in response.data["results"]}
+        self.assertEqual(ids, {str(self.comment.id), str(self.other_comment.id)})
+
+    def test_retrieve_outside_membership_is_not_found(self):
+        """Comments on other projects cannot be fetched"""
+        response = self.client.get(f"/api/comments/{self.private_comment.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_project_filter(self):
+        """?project= narrows the listing to one project"""
+        response = self.client.get(f"/api/comments/?project={self.project.id}")
+        self.assertEqual([item["id"] for item in response.data["results"]], [str(self.comment.id)])
+
+        response = self.client.get(f"/api/comments/?project={self.private_project.id}")
+        self.assertEqual(response.data["results"], [])
+
+    def test_invalid_project_filter(self):
+        """A malformed ?project= is a validation error"""
+        response = self.client.get("/api/comments/?project=not-a-uuid")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ProjectListingTest(TestCase):
+    """Test the project listing query plan"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create_user(username="member", email="member@example.com", password="password123")
+        self.projects = []
+        for i, role in enumerate(["owner", "editor", "reader", "reader"]):
+            owner = User.objects.create_user(username=f"owner{i}", email=f"owner{i}@example.com", password="password123")
+            project = Project.objects.create(name=f"Project {i}", owner=owner)
+            ProjectUserRole.objects.create(user=owner, project=project, role="owner")
+            if role != "owner":
+                ProjectUserRole.objects.create(user=self.user, project=project, role=role)
+            self.projects.append(project)
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_is_a_single_query(self):
+        """Owners and roles come with the page, not one query per project"""
+        # The conditional GET validators, then the page
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/projects/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_list_reports_owner_and_role(self):
+        """Each project carries its owner and the caller's role"""
+        response = self.client.get("/api/projects/")
+        roles = {item["id"]: (item["owner"], item["my_role"]) for item in response.data["results"]}
+        self.assertEqual(roles, {
+            str(self.projects[1].id): ("owner1@example.com", "editor"),
+            str(self.projects[2].id): ("owner2@example.com", "reader"),
+            str(self.projects[3].id): ("owner3@example.com", "reader"),
+        })
+
+class BulkRoleAssignmentTest(TestCase):
+    """Test POST /api/roles/bulk/"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.editor = User.objects.create_user(username="editor", email="editor@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.editor, project=self.project, role="editor")
+
+        self.new_users = [
+            User.objects.create(username=f"user{i}", email=f"user{i}@example.com") for i in range(25)
+        ]
+
+        self.client.force_authenticate(user=self.owner)
+
+    def post(self, roles):
+        data = {"project": str(self.project.id), "roles": roles}
+        return self.client.post("/api/roles/bulk/", data, format="json")
+
+    def test_bulk_assignment_reports_each_row(self):
+        """New members are created; existing, repeated and unknown users are reported"""
+        unknown = uuid.uuid4()
+        response = self.post([
+            {"user": str(self.new_users[0].id), "role": "reader"},
+            {"user": str(self.editor.id), "role": "reader"},
+            {"user": str(self.new_users[0].id), "role": "editor"},
+            {"user": str(unknown), "role": "reader"},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [row["status"] for row in response.data["data"]["results"]],
+            ["created", "exists", "duplicate", "unknown_user"],
+        )
+        self.assertEqual(
+            ProjectUserRole.objects.get(user=self.new_users[0], project=self.project).role, "reader"
+        )
+        self.assertEqual(ProjectUserRole.objects.get(user=self.editor, project=self.project).role, "editor")
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Assigning 4 or 20 users runs the same queries"""
+        self.post([{"user": str(self.new_users[0].id), "role": "reader"}])  # caches the owner's role
+        with CaptureQueriesContext(connection) as few:
+            self.post([{"user": str(user.id), "role": "reader"} for user in self.new_users[1:5]])
+        with CaptureQueriesContext(connection) as many:
+            self.post([{"user": str(user.id), "role": "reader"} for user in self.new_users[5:]])
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(ProjectUserRole.objects.filter(project=self.project).count(), 27)
+
+    def test_new_members_gain_access_immediately(self):
+        """Cached "no role" answers are invalidated for the new members"""
+        member = self.new_users[0]
+        self.client.force_authenticate(user=member)
+        response = self.client.post("/api/comments/", {"project": self.project.id, "text": "Hi"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.owner)
+        self.post([{"user": str(member.id), "role": "editor"}])
+
+        self.client.force_authenticate(user=member)
+        response = self.client.post("/api/comments/", {"project": self.project.id, "text": "Hi"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_only_owners_can_bulk_assign(self):
+        """Editors cannot assign roles in bulk"""
+        self.client.force_authenticate(user=self.editor)
+        response = self.post([{"user": str(self.new_users[0].id), "role": "reader"}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(ProjectUserRole.objects.filter(user=self.new_users[0]).exists())
+
+class CommentExportImportTest(TestCase):
+    """Test streaming comment export and import"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.reader, project=self.project, role="reader")
+
+        self.comments = [
+            Comment.objects.create(project=self.project, author=self.owner, text=f"Comment {i}, \"quoted\"")
+            for i in range(3)
+        ]
+        self.export_url = f"/api/projects/{self.project.id}/comments/export/"
+        self.import_url = f"/api/projects/{self.project.id}/comments/import/"
+
+        self.client.force_authenticate(user=self.owner)
+
+    def test_export_ndjson_matches_serializer(self):
+        """Each NDJSON line is the comment as the API represents it"""
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        expected = [dict(CommentSerializer(comment).data) for comment in self.comments]
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(expected, default=str)))
+
+    def test_export_csv(self):
+        """?format=csv streams a CSV file with a header row"""
+        response = self.client.get(f"{self.export_url}?format=csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row["text"] for row in rows], [comment.text for comment in self.comments])
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        """Under ASGI the export is an async iterator, so it is not buffered whole, with the same content"""
+        token = (await sync_to_async(ClaimsTokenObtainPairSerializer.get_token)(self.owner)).access_token
+
+        def sync_export(url):
+            return b"".join(self.client.get(url).streaming_content)
+
+        for url in [self.export_url, f"{self.export_url}?format=csv"]:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, headers={"Authorization": f"Bearer {token}"})
+                self.assertTrue(response.is_async)
+                content = b"".join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(content, await sync_to_async(sync_export)(url))
+
+    def test_export_requires_membership(self):
+        """Non-members cannot export"""
+        self.client.force_authenticate(user=self.outsider)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_ndjson(self):
+        """Valid records are inserted, invalid ones reported"""
+        body = "\n".join([
+            json.dumps({"text": "Imported 1"}),
+            "not json",
+            json.dumps({"text": ""}),
+            json.dumps({"text": "Imported 2"}),
+        ])
+        response = self.client.post(self.import_url, data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["data"]["imported"], 2)
+        self.assertEqual([error["record"] for error in response.data["data"]["errors"]], [2, 3])
+        self.assertEqual(
+            set(Comment.objects.filter(text__startswith="Imported").values_list("author", flat=True)),
+            {self.owner.id},
+        )
+
+    def test_import_csv(self):
+        """CSV imports read the "text" column"""
+        body = 'text\n"Line one\nline two"\nSecond\n'
+        response = self.client.post(self.import_url, data=body, content_type="text/csv")
+        self.assertEqual(response.data["data"]["imported"], 2)
+        self.assertTrue(Comment.objects.filter(text="Line one\nline two").exists())
+
+    def test_import_stopped_midway_reports_what_was_imported(self):
+        """A body that stops decoding after committed batches is a partial success, not a bare 400"""
+        body = "".join(json.dumps({"text": f"Imported {i}"}) + "\n" for i in range(3)).encode() + b'{"text": "\xff"}\n'
+        with mock.patch("core.comment_io.IMPORT_BATCH_SIZE", 2):
+            response = self.client.post(self.import_url, data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["data"]["imported"], response.data["data"]["stopped_at"]), (3, 4))
+        self.assertEqual(Comment.objects.filter(text__startswith="Imported").count(), 3)
+
+    def test_unreadable_import_imports_nothing(self):
+        """A body that cannot be read from the start is rejected"""
+        response = self.client.post(self.import_url, data=b'{"text": "\xff"}\n', content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Comment.objects.filter(text__startswith="Imported").exists())
+
+    def test_readers_cannot_import(self):
+        """Readers cannot import comments"""
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.post(self.import_url, data='{"text": "x"}', content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ValuesListParityTest(TestCase):
+    """Test that the .values() list fast path renders the same JSON as the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.editor = User.objects.create_user(username="editor", email="editor@example.com", password="password123")
+        for i in range(3):
+            project = Project.objects.create(name=f"Projet n°{i} ✓", description="" if i else "Ünïcode\n\"quotes\"",
+                                             owner=self.owner)
+            ProjectUserRole.objects.create(user=self.owner, project=project, role="owner")
+            ProjectUserRole.objects.create(user=self.editor, project=project, role="editor" if i else "reader")
+            for j in range(3):
+                Comment.objects.create(project=project, author=self.editor if j else self.owner,
+                                       text=f"Comment {j} — ü \\ \"q\"")
+
+        self.client.force_authenticate(user=self.editor)
+
+    def assert_same_json(self, url):
+        with self.settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(url)
+        with self.settings(FAST_LIST_SERIALIZATION=True):
+            actual = self.client.get(url)
+        self.assertEqual(actual.status_code, status.HTTP_200_OK)
+        self.assertTrue(json.loads(actual.content)["results"])
+        self.assertEqual(actual.content, expected.content)
+
+    def test_project_list_parity(self):
+        self.assert_same_json("/api/projects/")
+
+    def test_comment_list_parity(self):
+        self.assert_same_json("/api/comments/?page_size=4")
+
+    def test_role_list_parity(self):
+        self.assert_same_json("/api/roles/")
+
+    def test_offset_page_parity(self):
+        self.assert_same_json("/api/comments/?limit=3&offset=2")
+
+    def test_cursor_follow_parity(self):
+        """The next cursor built from .values() rows points at the same page"""
+        first = self.client.get("/api/comments/?page_size=4")
+        self.assert_same_json(first.data["next"])
+
+class FastJSONTest(SimpleTestCase):
+    """Test that the fast JSON renderer and parser behave like DRF's"""
+
+    payload = {
+        "id": uuid.UUID("0b4a3a55-3f0e-4a32-9c59-2e0f8e9a4a6d"),
+        "created_at": datetime(2025, 3, 15, 20, 42, 1, 123456, tzinfo=dt_timezone.utc),
+        "day": date(2025, 3, 15),
+        "price": Decimal("1.50"),
+        "text": "Ünïcode ✓ \u2028\u2029 \"quoted\" \\",
+        "label": gettext_lazy("Project"),
+        "nested": [{"n": 1, "ok": True, "none": None, "f": 0.1}],
+        1: "int key",
+    }
+
+    def test_renderer_matches_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_renderer_without_backend_matches_drf(self):
+        with mock.patch("core.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_renderer_indent_matches_drf(self):
+        media_type = "application/json; indent=2"
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, media_type),
+            JSONRenderer().render(self.payload, media_type),
+        )
+
+    def test_parser(self):
+        body = '{"project": "0b4a3a55-3f0e-4a32-9c59-2e0f8e9a4a6d", "text": "ü"}'.encode()
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body), "application/json"),
+            {"project": "0b4a3a55-3f0e-4a32-9c59-2e0f8e9a4a6d", "text": "ü"},
+        )
+
+    def test_parser_rejects_invalid_json(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"text": NaN}'), "application/json")
+
+class ConditionalGetTest(TestCase):
+    """Test ETag / Last-Modified handling on projects and comments"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        self.reader_role = ProjectUserRole.objects.create(user=self.reader, project=self.project, role="reader")
+        self.comment = Comment.objects.create(project=self.project, author=self.owner, text="First")
+
+        self.client.force_authenticate(user=self.owner)
+
+    def test_unchanged_list_is_not_modified(self):
+        """A repeated poll gets a 304 from the validator query alone"""
+        response = self.client.get("/api/comments/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/comments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_list_etag_changes_on_writes(self):
+        """New, edited and deleted comments all change the list ETag"""
+        etags = [self.client.get("/api/comments/")["ETag"]]
+
+        other = Comment.objects.create(project=self.project, author=self.owner, text="Second")
+        etags.append(self.client.get("/api/comments/")["ETag"])
+
+        self.comment.text = "Edited"
+        self.comment.save()
+        etags.append(self.client.get("/api/comments/")["ETag"])
+
+        other.delete()
+        etags.append(self.client.get("/api/comments/")["ETag"])
+
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get("/api/comments/", HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_ignores_if_modified_since(self):
+        """Lists carry no Last-Modified, so a deletion is not hidden behind an If-Modified-Since 304"""
+        other = Comment.objects.create(project=self.project, author=self.owner, text="Second")
+        response = self.client.get("/api/comments/")
+        self.assertNotIn("Last-Modified", response)
+
+        since = self.client.get(f"/api/comments/{self.comment.id}/")["Last-Modified"]
+        other.delete()
+        response = self.client.get("/api/comments/", HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_list_etag_depends_on_query_and_caller(self):
+        """Different pages and different users never share an ETag"""
+        etag = self.client.get("/api/projects/")["ETag"]
+        self.assertNotEqual(self.client.get("/api/projects/?page_size=1")["ETag"], etag)
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get("/api/projects/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_change_invalidates_project_list(self):
+        """my_role is part of the listing, so a role change must produce a 200"""
+        self.client.force_authenticate(user=self.reader)
+        etag = self.client.get("/api/projects/")["ETag"]
+
+        self.reader_role.role = "editor"
+        self.reader_role.save()
+        response = self.client.get("/api/projects/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["my_role"], "editor")
+
+    def test_retrieve_not_modified(self):
+        """Retrieve honours If-None-Match and If-Modified-Since"""
+        url = f"/api/projects/{self.project.id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_not_modified_still_checks_access(self):
+        """A non-member cannot use a validator to learn about a comment"""
+        etag = self.client.get(f"/api/comments/{self.comment.id}/")["ETag"]
+
+        outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+        self.client.force_authenticate(user=outsider)
+        response = self.client.get(f"/api/comments/{self.comment.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ProjectCountersTest(TestCase):
+    """Test the denormalized comment and member counters on Project"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.other = User.objects.create_user(username="other", email="other@example.com", password="password123")
+        self.seed = Project.objects.create(name="Seed Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.seed, role="owner")
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post("/api/projects/", {"name": "Tracked Project"})
+        self.project = Project.objects.get(pk=response.data["id"])
+
+    def counters(self):
+        self.project.refresh_from_db()
+        return self.project.comment_count, self.project.last_comment_at, self.project.member_count
+
+    def test_project_starts_with_its_owner(self):
+        self.assertEqual(self.counters(), (0, None, 1))
+
+    def test_comment_writes_update_counters(self):
+        """Adding and deleting comments keeps count and last activity in step"""
+        first = self.client.post("/api/comments/", {"project": self.project.id, "text": "One"}).data
+        second = self.client.post("/api/comments/", {"project": self.project.id, "text": "Two"}).data
+        count, last_comment_at, _ = self.counters()
+        self.assertEqual(count, 2)
+        self.assertEqual(last_comment_at, Comment.objects.get(pk=second["id"]).created_at)
+
+        self.client.delete(f"/api/comments/{second['id']}/")
+        count, last_comment_at, _ = self.counters()
+        self.assertEqual(count, 1)
+        self.assertEqual(last_comment_at, Comment.objects.get(pk=first["id"]).created_at)
+
+    def test_import_updates_counters(self):
+        body = "\n".join(json.dumps({"text": f"Imported {i}"}) for i in range(3))
+        self.client.post(f"/api/projects/{self.project.id}/comments/import/", data=body,
+                         content_type="application/x-ndjson")
+        self.assertEqual(self.counters()[0], 3)
+
+    def test_role_writes_update_member_count(self):
+        """Single, bulk and removed roles all adjust the member count"""
+        role = self.client.post("/api/roles/", {"user": self.other.id, "project": self.project.id, "role": "reader"})
+        self.assertEqual(self.counters()[2], 2)
+
+        third = User.objects.create(username="third", email="third@example.com")
+        self.client.post("/api/roles/bulk/", {
+            "project": str(self.project.id), "roles": [{"user": str(third.id), "role": "editor"}],
+        }, format="json")
+        self.assertEqual(self.counters()[2], 3)
+
+        self.client.delete(f"/api/roles/{role.data['id']}/")
+        self.assertEqual(self.counters()[2], 2)
+
+    def test_listing_exposes_counters(self):
+        self.client.post("/api/comments/", {"project": self.project.id, "text": "One"})
+        response = self.client.get("/api/projects/?page_size=1")
+        project = response.data["results"][0]
+        self.assertEqual((project["comment_count"], project["member_count"]), (1, 1))
+        self.assertIsNotNone(project["last_comment_at"])
+
+    def test_recompute_command_can_queue_repairs(self):
+        """With --queue, drifted projects are repaired by the task worker"""
+        Project.objects.filter(pk=self.project.pk).update(comment_count=9, member_count=0)
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("recompute_project_counters", queue=True, stdout=out)
+        self.assertIn("Done: 2 of 2 projects queued for repair.", out.getvalue())
+        self.assertEqual(self.counters(), (9, None, 0))
+
+        run_tasks()
+        self.assertEqual(self.counters(), (0, None, 1))
+        self.assertFalse(Task.objects.exists())
+
+    def test_recompute_command(self):
+        """The management command repairs counters drifted by writes outside the API"""
+        Comment.objects.create(project=self.project, author=self.owner, text="Direct")
+        ProjectUserRole.objects.create(user=self.other, project=self.project, role="reader")
+        Project.objects.filter(pk=self.seed.pk).update(comment_count=5)
+
+        out = io.StringIO()
+        call_command("recompute_project_counters", batch_size=1, stdout=out)
+        self.assertIn("Done: 2 of 2 projects corrected.", out.getvalue())
+
+        count, last_comment_at, members = self.counters()
+        self.assertEqual((count, members), (1, 2))
+        self.assertEqual(last_comment_at, Comment.objects.get(text="Direct").created_at)
+        self.seed.refresh_from_db()
+        self.assertEqual(self.seed.comment_count, 0)
+
+
+class AsyncViewsTest(TestCase):
+    """Test the async endpoints under /api/async/ against the viewsets they mirror"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.reader, project=self.project, role="reader")
+        self.private_project = Project.objects.create(name="Private Project", owner=self.outsider)
+        ProjectUserRole.objects.create(user=self.outsider, project=self.private_project, role="owner")
+        self.comment = Comment.objects.create(project=self.project, author=self.owner, text="Hello")
+
+    def auth(self, user):
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def test_lists_match_sync_endpoints(self):
+        """The async lists return the same JSON as the viewsets"""
+        for path in ["projects/", "comments/", f"comments/?project={self.project.pk}", "roles/"]:
+            with self.subTest(path=path):
+                sync_response = self.client.get(f"/api/{path}", **self.auth(self.owner))
+                async_response = self.client.get(f"/api/async/{path}", **self.auth(self.owner))
+                self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_retrieve_matches_sync_endpoint(self):
+        for path in [f"projects/{self.project.pk}/", f"comments/{self.comment.pk}/"]:
+            with self.subTest(path=path):
+                sync_response = self.client.get(f"/api/{path}", **self.auth(self.reader))
+                async_response = self.client.get(f"/api/async/{path}", **self.auth(self.reader))
+                self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_retrieve_outside_membership_is_not_found(self):
+        response = self.client.get(f"/api/async/projects/{self.private_project.pk}/", **self.auth(self.owner))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        response = self.client.get("/api/async/projects/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    def test_create_comment(self):
+        """Owners and Editors can comment, and the project counters follow"""
+        before = self.project.comment_count
+        response = self.client.post(
+            "/api/async/comments/", {"project": str(self.project.pk), "text": "Async"},
+            content_type="application/json", **self.auth(self.owner),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["author"], str(self.owner.pk))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.comment_count, before + 1)
+
+    def test_writes_need_no_csrf_token(self):
+        """Bearer-authenticated writes pass CSRF checks, as on the sync endpoints"""
+        client = Client(enforce_csrf_checks=True)
+        requests = [
+            ("projects/", {"name": "Csrf Project"}),
+            ("comments/", {"project": str(self.project.pk), "text": "Csrf"}),
+            ("roles/", {"project": str(self.project.pk), "user": str(self.outsider.pk), "role": "reader"}),
+        ]
+        for path, data in requests:
+            with self.subTest(path=path):
+                response = client.post(f"/api/async/{path}", data, content_type="application/json",
+                                       **self.auth(self.owner))
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_reader_cannot_comment(self):
+        response = self.client.post(
+            "/api/async/comments/", {"project": str(self.project.pk), "text": "Nope"},
+            content_type="application/json", **self.auth(self.reader),
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_project(self):
+        response = self.client.post(
+            "/api/async/projects/", {"name": "Async Project"},
+            content_type="application/json", **self.auth(self.owner),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        project = Project.objects.get(pk=response.json()["id"])
+        self.assertEqual(project.owner, self.owner)
+        self.assertTrue(ProjectUserRole.objects.filter(user=self.owner, project=project, role="owner").exists())
+
+    def test_only_owner_assigns_roles(self):
+        before = self.project.member_count
+        data = {"project": str(self.project.pk), "user": str(self.outsider.pk), "role": "editor"}
+        response = self.client.post("/api/async/roles/", data, content_type="application/json", **self.auth(self.reader))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post("/api/async/roles/", data, content_type="application/json", **self.auth(self.owner))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.member_count, before + 1)
+
+    def test_invalid_body_is_rejected(self):
+        response = self.client.post(
+            "/api/async/comments/", {"text": "No project"}, content_type="application/json", **self.auth(self.owner),
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("project", response.json())
+
+
+@override_settings(REPLICA_DATABASE_ALIAS="replica")
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Test that safe requests read from the replica and writes go to the primary.
+    The replica is a test mirror, so committed rows are visible through it.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        caches[settings.REPLICA_STICKY_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        ProjectUserRole.objects.create(user=self.user, project=self.project, role="owner")
+        self.client.force_authenticate(user=self.user)
+
+    def assertServedBy(self, alias, method, *args, **kwargs):
+        other = "default" if alias == "replica" else "replica"
+        with CaptureQueriesContext(connections[alias]) as used, CaptureQueriesContext(connections[other]) as unused:
+            response = getattr(self.client, method)(*args, **kwargs)
+        self.assertTrue(used, f"no queries on {alias}")
+        self.assertEqual(len(unused), 0, f"queries on {other}: {[q['sql'] for q in unused]}")
+        return response
+
+    def test_reads_use_replica(self):
+        for path in ["/api/projects/", f"/api/projects/{self.project.pk}/", "/api/comments/", "/api/roles/"]:
+            with self.subTest(path=path):
+                response = self.assertServedBy("replica", "get", path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_use_primary_and_make_caller_sticky(self):
+        response = self.assertServedBy(
+            "default", "post", "/api/comments/", {"project": str(self.project.pk), "text": "Hi"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # The writer reads their own write from the primary
+        response = self.assertServedBy("default", "get", "/api/comments/")
+        self.assertEqual(len(response.data["results"]), 1)
+
+        # Everyone else still reads from the replica
+        other = User.objects.create_user(username="other", email="other@example.com", password="password123")
+        self.client.force_authenticate(user=other)
+        self.assertServedBy("replica", "get", "/api/comments/")
+
+    def test_failed_write_does_not_make_caller_sticky(self):
+        response = self.client.post("/api/comments/", {"text": "No project"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertServedBy("replica", "get", "/api/comments/")
+
+    def test_replica_is_never_migrated(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate("default", "core"))
+        self.assertFalse(router.allow_migrate("replica", "core"))
+
+
+class SearchTest(TestCase):
+    """Test full-text search over the caller's projects and comments"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="member", email="member@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project = Project.objects.create(name="Apollo launch", description="Moon mission", owner=self.user)
+            ProjectUserRole.objects.create(user=self.user, project=self.project, role="owner")
+            self.private_project = Project.objects.create(name="Private", owner=self.outsider)
+            ProjectUserRole.objects.create(user=self.outsider, project=self.private_project, role="owner")
+
+            self.comment = Comment.objects.create(
+                project=self.project, author=self.user, text="Fuel valve inspection before launch"
+            )
+            Comment.objects.create(project=self.private_project, author=self.outsider, text="Secret launch codes")
+        # Saved objects are indexed by the task worker
+        run_tasks()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get("/api/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def hits(self, query):
+        return [(item["type"], item["object"]["id"]) for item in self.search(query).data["results"]]
+
+    def test_results_are_scoped_and_ranked(self):
+        """Only the caller's projects match, and name matches rank above comment matches"""
+        self.assertEqual(self.hits("launch"), [("project", str(self.project.pk)), ("comment", str(self.comment.pk))])
+
+    def test_results_carry_list_representation(self):
+        item = self.search("moon").data["results"][0]
+        self.assertEqual(item["object"]["my_role"], "owner")
+        self.assertEqual(item["object"]["owner"], self.user.email)
+
+    def test_stemming_and_prefix(self):
+        self.assertEqual(self.hits("inspections"), [("comment", str(self.comment.pk))])
+        self.assertEqual(self.hits("insp"), [("comment", str(self.comment.pk))])
+
+    def test_index_follows_writes(self):
+        self.comment.text = "Oxygen tank check"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comment.save()
+        self.assertEqual(self.hits("oxygen"), [])
+        run_tasks()
+        self.assertEqual(self.hits("valve"), [])
+        self.assertEqual(self.hits("oxygen"), [("comment", str(self.comment.pk))])
+
+        self.comment.delete()
+        self.assertEqual(self.hits("oxygen"), [])
+
+    def test_imported_comments_are_indexed(self):
+        body = b'{"text": "Telemetry downlink"}\n'
+        response = self.client.post(f"/api/projects/{self.project.pk}/comments/import/", body,
+                                    content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([kind for kind, _ in self.hits("telemetry")], ["comment"])
+
+    def test_pagination(self):
+        first = self.search("launch", limit=1).data
+        self.assertEqual(len(first["results"]), 1)
+        self.assertIsNotNone(first["next"])
+        second = self.client.get(first["next"]).data
+        self.assertEqual(second["results"][0]["object"]["id"], str(self.comment.pk))
+        self.assertIsNone(second["next"])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('launch" OR (NOT').data["results"], [])
+        self.assertEqual(self.search("*").data["results"], [])
+
+    def test_query_is_required(self):
+        response = self.client.get("/api/search/", {"q": "  "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChangesFeedTest(TestCase):
+    """Test the incremental changes feed: deltas after a cursor, scoped to the caller, with tombstones"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.member = User.objects.create_user(username="member", email="member@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Shared", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        self.role = ProjectUserRole.objects.create(user=self.member, project=self.project, role="editor")
+        self.private_project = Project.objects.create(name="Private", owner=self.outsider)
+        ProjectUserRole.objects.create(user=self.outsider, project=self.private_project, role="owner")
+        self.client.force_authenticate(user=self.member)
+        self.cursor = self.client.get("/api/changes/").data["cursor"]
+
+    def changes(self, since=None, **params):
+        response = self.client.get("/api/changes/", {"since": self.cursor if since is None else since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def summary(self, data):
+        return [(item["type"], item["action"], str(item["id"])) for item in data["results"]]
+
+    def test_without_cursor_returns_current_cursor(self):
+        data = self.client.get("/api/changes/").data
+        self.assertEqual(data["results"], [])
+        self.assertGreater(data["cursor"], 0)
+        self.assertEqual(self.changes()["results"], [])
+
+    def test_deltas_are_scoped_to_the_callers_projects(self):
+        comment = Comment.objects.create(project=self.project, author=self.owner, text="Hello")
+        Comment.objects.create(project=self.private_project, author=self.outsider, text="Hidden")
+
+        data = self.changes()
+        self.assertEqual(self.summary(data), [("comment", "created", str(comment.pk))])
+        self.assertEqual(data["results"][0]["object"]["text"], "Hello")
+        self.assertEqual(self.changes(since=data["cursor"])["results"], [])
+
+    def test_repeated_changes_collapse_to_the_latest(self):
+        comment = Comment.objects.create(project=self.project, author=self.owner, text="Draft")
+        comment.text = "Final"
+        comment.save()
+        self.project.name = "Renamed"
+        self.project.save()
+
+        data = self.changes()
+        self.assertEqual(self.summary(data), [
+            ("comment", "updated", str(comment.pk)),
+            ("project", "updated", str(self.project.pk)),
+        ])
+        self.assertEqual(data["results"][0]["object"]["text"], "Final")
+        self.assertEqual(data["results"][1]["object"]["my_role"], "editor")
+
+    def test_deletes_come_as_tombstones(self):
+        comment = Comment.objects.create(project=self.project, author=self.owner, text="Short-lived")
+        comment_id = comment.pk
+        comment.delete()
+
+        results = self.changes()["results"]
+        self.assertEqual([(item["action"], item["object"]) for item in results], [("deleted", None)])
+        self.assertEqual(results[0]["id"], comment_id)
+
+    def test_removed_member_sees_their_role_tombstone(self):
+        self.role.delete()
+        results = self.changes()["results"]
+        self.assertEqual([(item["type"], item["action"], item["project"]) for item in results],
+                         [("role", "deleted", self.project.pk)])
+
+    def test_bulk_paths_are_logged(self):
+        self.client.force_authenticate(user=self.owner)
+        body = b'{"text": "One"}\n{"text": "Two"}\n'
+        self.client.post(f"/api/projects/{self.project.pk}/comments/import/", body, content_type="application/x-ndjson")
+        self.client.post("/api/roles/bulk/", {"project": self.project.pk, "roles": [{"user": self.outsider.pk, "role": "reader"}]},
+                         format="json")
+
+        self.client.force_authenticate(user=self.outsider)
+        kinds = [(item["type"], item["action"]) for item in self.changes()["results"]]
+        self.assertEqual(kinds, [("comment", "created"), ("comment", "created"), ("role", "created")])
+
+    def test_pagination(self):
+        for i in range(3):
+            Comment.objects.create(project=self.project, author=self.owner, text=f"Comment {i}")
+
+        first = self.changes(limit=2)
+        self.assertEqual(len(first["results"]), 2)
+        self.assertIsNotNone(first["next"])
+        second = self.client.get(first["next"]).data
+        self.assertEqual([item["object"]["text"] for item in second["results"]], ["Comment 2"])
+        self.assertIsNone(second["next"])
+
+    @override_settings(CHANGES_GAP_SECONDS=60)
+    def test_entries_past_a_missing_id_are_held_back(self):
+        """An id missing below newer entries may still commit: the feed stops before it until it shows up"""
+        changes.horizon.reset()
+        self.addCleanup(changes.horizon.reset)
+        first, in_flight, last = (Comment.objects.create(project=self.project, author=self.owner, text=text)
+                                  for text in ("First", "In flight", "Last"))
+        entry = ChangeLogEntry.objects.get(object_id=in_flight.pk)
+        ChangeLogEntry.objects.filter(pk=entry.pk).delete()
+
+        data = self.changes()
+        self.assertEqual(self.summary(data), [("comment", "created", str(first.pk))])
+        self.assertEqual(self.changes(since=data["cursor"])["results"], [])
+        self.assertEqual(changes.latest_cursor(), data["cursor"])
+
+        entry.save(force_insert=True)
+        self.assertEqual([item["id"] for item in self.changes(since=data["cursor"])["results"]],
+                         [in_flight.pk, last.pk])
+
+    @override_settings(CHANGES_GAP_SECONDS=60)
+    def test_old_missing_ids_count_as_rolled_back(self):
+        """A missing id is given up once the entry after it is older than CHANGES_GAP_SECONDS"""
+        changes.horizon.reset()
+        self.addCleanup(changes.horizon.reset)
+        rolled_back = Comment.objects.create(project=self.project, author=self.owner, text="Rolled back")
+        last = Comment.objects.create(project=self.project, author=self.owner, text="Last")
+        ChangeLogEntry.objects.filter(object_id=rolled_back.pk).delete()
+        self.assertEqual(self.changes()["results"], [])
+
+        later = datetime.now(dt_timezone.utc) + timedelta(minutes=2)
+        with mock.patch("core.changes.timezone.now", return_value=later):
+            self.assertEqual(self.summary(self.changes()), [("comment", "created", str(last.pk))])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/changes/", {"since": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EVENTS_BROKER="core.events.LocalBroker", EVENTS_KEEPALIVE_SECONDS=0.05)
+class ProjectEventsTest(TestCase):
+    """Test live project events: replay from the change log, live pushes, and dropping subscribers"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Test Project", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        self.reader_role = ProjectUserRole.objects.create(user=self.reader, project=self.project, role="reader")
+        self.url = f"/api/async/projects/{self.project.pk}/events/"
+        # Issued up front: issuing a token writes to the database
+        self.tokens = {
+            user.pk: ClaimsTokenObtainPairSerializer.get_token(user).access_token
+            for user in (self.owner, self.reader, self.outsider)
+        }
+
+    def tearDown(self):
+        events.hub.reset()
+
+    def headers(self, user):
+        return {"Authorization": f"Bearer {self.tokens[user.pk]}"}
+
+    def committed(self, write):
+        with self.captureOnCommitCallbacks(execute=True):
+            return write()
+
+    async def next_event(self, stream):
+        """The next event of the stream, past keepalives, parsed into its fields."""
+        while True:
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+            if not chunk.startswith(":"):
+                fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+                fields["data"] = json.loads(fields["data"])
+                return fields
+
+    async def open(self, user, **params):
+        response = await self.async_client.get(self.url, params, headers=self.headers(user))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        # The first keepalive means the stream has subscribed
+        self.assertEqual(await anext(stream), b": keepalive\n\n")
+        return stream
+
+    async def test_replays_from_cursor(self):
+        cursor = await sync_to_async(changes.latest_cursor)()
+        comment = await Comment.objects.acreate(project=self.project, author=self.owner, text="Missed")
+
+        response = await self.async_client.get(self.url, {"since": cursor}, headers=self.headers(self.reader))
+        event = await self.next_event(aiter(response.streaming_content))
+        self.assertEqual(event["event"], "comment")
+        self.assertEqual(event["data"]["object"]["id"], str(comment.pk))
+        self.assertEqual(int(event["id"]), event["data"]["cursor"])
+
+    async def test_pushes_committed_comments(self):
+        stream = await self.open(self.reader)
+        comment = await sync_to_async(self.committed)(
+            lambda: Comment.objects.create(project=self.project, author=self.owner, text="Live")
+        )
+        event = await self.next_event(stream)
+        self.assertEqual((event["event"], event["data"]["action"]), ("comment", "created"))
+        self.assertEqual(event["data"]["object"]["text"], "Live")
+        self.assertEqual(event["data"]["id"], str(comment.pk))
+
+    async def test_removed_member_is_revoked(self):
+        stream = await self.open(self.reader)
+        await sync_to_async(self.committed)(self.reader_role.delete)
+        event = await self.next_event(stream)
+        self.assertEqual((event["event"], event["data"]["action"]), ("role", "deleted"))
+        self.assertEqual((await self.next_event(stream))["event"], "revoked")
+
+    async def test_outsider_cannot_subscribe(self):
+        response = await self.async_client.get(self.url, headers=self.headers(self.outsider))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_slow_subscriber_is_dropped(self):
+        subscription = events.hub.subscribe(self.project.pk, maxsize=2)
+        batch = [{"project": self.project.pk, "cursor": cursor} for cursor in range(3)]
+        await asyncio.to_thread(events.hub.publish, batch)
+        self.assertIs(await subscription.get(1), events.DROPPED)
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_change_log_broker_polls_other_writers(self):
+        subscription = events.hub.subscribe(self.project.pk)
+        broker = events.ChangeLogBroker()
+        broker._cursor = await sync_to_async(changes.latest_cursor)()
+        await Comment.objects.acreate(project=self.project, author=self.owner, text="From another worker")
+
+        self.assertTrue(await sync_to_async(broker.poll)())
+        event = await subscription.get(1)
+        self.assertEqual(event["object"]["text"], "From another worker")
+
+    async def test_change_log_broker_survives_poll_errors(self):
+        """A failed poll is logged and retried; events still arrive afterwards"""
+        subscription = events.hub.subscribe(self.project.pk)
+        broker = events.ChangeLogBroker()
+        broker._cursor = await sync_to_async(changes.latest_cursor)()
+        await Comment.objects.acreate(project=self.project, author=self.owner, text="After the outage")
+
+        outcomes = iter([OperationalError("database is locked"), broker.poll, lambda: False])
+
+        def flaky_poll():
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome()
+
+        with mock.patch.object(broker, "poll", flaky_poll), mock.patch("core.events.time.sleep") as sleep, \
+                mock.patch.object(events.connections, "close_all"), self.assertLogs("core.events", "ERROR"):
+            await sync_to_async(broker.run)()
+        sleep.assert_called_once()
+        event = await subscription.get(1)
+        self.assertEqual(event["object"]["text"], "After the outage")
+
+
+@override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+class MetricsTest(TestCase):
+    """Test per-request metrics, the /metrics endpoint and the N+1 warning"""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        ProjectUserRole.objects.create(user=self.user, project=self.project, role="owner")
+        self.client.force_authenticate(user=self.user)
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return dict(line.rsplit(" ", 1) for line in response.content.decode().splitlines() if not line.startswith("#"))
+
+    def test_requests_are_tagged_by_action(self):
+        self.client.get("/api/projects/")
+        self.client.get(f"/api/projects/{self.project.pk}/")
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_total{endpoint="ProjectViewSet.list",status="200"}'], "1")
+        self.assertEqual(samples['http_request_db_queries_count{endpoint="ProjectViewSet.retrieve"}'], "1")
+        self.assertEqual(samples['http_request_db_queries_sum{endpoint="ProjectViewSet.retrieve"}'], "1")
+        self.assertGreater(float(samples['http_request_serializer_seconds_sum{endpoint="ProjectViewSet.retrieve"}']), 0)
+        self.assertEqual(samples['http_request_duration_seconds_bucket{endpoint="ProjectViewSet.list",le="+Inf"}'], "1")
+
+    def test_async_views_count_their_queries(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.get("/api/async/projects/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        samples = self.scrape()
+        self.assertGreater(int(samples['http_request_db_queries_sum{endpoint="ProjectListView.get"}']), 0)
+
+    def test_unmatched_requests(self):
+        self.client.get("/no-such-page/")
+        self.assertIn('http_requests_total{endpoint="unmatched",status="404"}', self.scrape())
+
+    def test_scrape_is_restricted(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_scrape_is_disabled_by_default(self):
+        with self.settings(METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_NPLUSONE_HEADER=True, METRICS_NPLUSONE_THRESHOLD=3)
+    def test_repeated_select_is_flagged(self):
+        def view(request):
+            for _ in range(3):
+                Project.objects.filter(pk=self.project.pk).exists()
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        response = metrics.MetricsMiddleware(view)(request)
+        self.assertTrue(response["X-Query-Warning"].startswith("N+1: 3x SELECT"))
+
+        response = metrics.MetricsMiddleware(lambda request: HttpResponse())(request)
+        self.assertNotIn("X-Query-Warning", response)
+
+
+class SeedDataTest(TestCase):
+    """Test the seed_data command that fills the database for benchmarks"""
+
+    def seed(self, **options):
+        call_command("seed_data", users=10, projects=4, members=3, comments=50, batch_size=7,
+                     stdout=io.StringIO(), **options)
+
+    def test_seeds_consistent_rows(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(username__startswith="seed_").count(), 10)
+        self.assertEqual(Comment.objects.count(), 50)
+        for project in Project.objects.all():
+            roles = ProjectUserRole.objects.filter(project=project)
+            self.assertEqual(roles.count(), 3)
+            self.assertTrue(roles.filter(user=project.owner, role="owner").exists())
+            self.assertEqual(project.member_count, 3)
+            self.assertEqual(project.comment_count, Comment.objects.filter(project=project).count())
+        # Authors are members of the project they comment on
+        self.assertFalse(Comment.objects.exclude(
+            Exists(ProjectUserRole.objects.filter(project=OuterRef("project"), user=OuterRef("author")))
+        ).exists())
+
+    def test_seeded_users_can_log_in(self):
+        self.seed(password="secret-pass")
+        response = self.client.post("/api/accounts/login/", {"email": "seed_0@example.com", "password": "secret-pass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_prefix_must_be_new(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(prefix="other")
+        self.assertEqual(Comment.objects.count(), 100)
+
+
+class ProjectAccessTest(TestCase):
+    """Test the batch role lookup behind POST /api/projects/access/"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="member", email="member@example.com", password="password123")
+        self.other = User.objects.create_user(username="other", email="other@example.com", password="password123")
+
+        self.projects = [Project.objects.create(name=f"Project {i}", owner=self.other) for i in range(4)]
+        ProjectUserRole.objects.create(user=self.user, project=self.projects[0], role="owner")
+        self.reader_role = ProjectUserRole.objects.create(user=self.user, project=self.projects[1], role="reader")
+        ProjectUserRole.objects.create(user=self.other, project=self.projects[2], role="owner")
+        self.client.force_authenticate(user=self.user)
+        reset_role_cache_stats()
+
+    def access(self, project_ids):
+        response = self.client.post("/api/projects/access/", {"projects": [str(pk) for pk in project_ids]},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["roles"]
+
+    def test_role_map(self):
+        missing = uuid.uuid4()
+        ids = [project.pk for project in self.projects] + [missing]
+        self.assertEqual(self.access(ids), {
+            str(self.projects[0].pk): "owner",
+            str(self.projects[1].pk): "reader",
+            str(self.projects[2].pk): None,
+            str(self.projects[3].pk): None,
+            str(missing): None,
+        })
+
+    def test_one_query_then_cached(self):
+        """One IN query for the whole batch, then served from the role cache"""
+        ids = [project.pk for project in self.projects]
+        with self.assertNumQueries(1):
+            self.access(ids)
+        with self.assertNumQueries(0):
+            self.access(ids)
+        self.assertEqual(role_cache_stats(), {"hits": 4, "misses": 4})
+
+    def test_revocation_is_visible(self):
+        self.access([self.projects[1].pk])
+        self.reader_role.delete()
+        self.assertEqual(self.access([self.projects[1].pk]), {str(self.projects[1].pk): None})
+
+    def test_invalid_batches(self):
+        too_many = [str(uuid.uuid4()) for _ in range(1001)]
+        for projects in ([], ["not-a-uuid"], too_many):
+            with self.subTest(size=len(projects)):
+                response = self.client.post("/api/projects/access/", {"projects": projects}, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post("/api/projects/access/", {"projects": [str(self.projects[0].pk)]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SoftDeleteTest(TestCase):
+    """Test that deleting a project hides it at once, and that purge_deleted_projects removes it in batches"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.member = User.objects.create_user(username="member", email="member@example.com", password="password123")
+
+        self.project = Project.objects.create(name="Doomed", owner=self.owner, member_count=2, comment_count=5)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        ProjectUserRole.objects.create(user=self.member, project=self.project, role="editor")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.comments = [
+                Comment.objects.create(project=self.project, author=self.member, text=f"Archived note {i}")
+                for i in range(5)
+            ]
+        run_tasks()
+        self.client.force_authenticate(user=self.member)
+        self.cursor = self.client.get("/api/changes/").data["cursor"]
+
+    def delete(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.client.force_authenticate(user=self.member)
+
+    def purge(self, **options):
+        out = io.StringIO()
+        call_command("purge_deleted_projects", stdout=out, **options)
+        return out.getvalue()
+
+    def test_deleted_project_is_hidden_everywhere(self):
+        self.delete()
+        self.assertEqual(self.client.get(f"/api/projects/{self.project.pk}/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/api/projects/").data["results"], [])
+        self.assertEqual(self.client.get("/api/comments/").data["results"], [])
+        self.assertEqual(self.client.get("/api/search/", {"q": "archived"}).data["results"], [])
+        response = self.client.post("/api/comments/", {"project": str(self.project.pk), "text": "Too late"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # The rows are still there until the purge
+        self.assertEqual(Comment.all_objects.filter(project_id=self.project.pk).count(), 5)
+        self.assertEqual(ProjectUserRole.all_objects.filter(project_id=self.project.pk).count(), 2)
+
+    def test_cached_roles_are_invalidated(self):
+        response = self.client.post("/api/projects/access/", {"projects": [str(self.project.pk)]}, format="json")
+        self.assertEqual(response.data["roles"], {str(self.project.pk): "editor"})
+        self.delete()
+        response = self.client.post("/api/projects/access/", {"projects": [str(self.project.pk)]}, format="json")
+        self.assertEqual(response.data["roles"], {str(self.project.pk): None})
+
+    def test_delete_does_not_load_comments(self):
+        """The delete costs the same whatever the number of comments"""
+        self.client.force_authenticate(user=self.owner)
+        empty = Project.objects.create(name="Empty", owner=self.owner)
+        ProjectUserRole.objects.create(user=self.owner, project=empty, role="owner")
+        ProjectUserRole.objects.create(user=self.member, project=empty, role="editor")
+        with CaptureQueriesContext(connection) as empty_delete:
+            self.client.delete(f"/api/projects/{empty.pk}/")
+        with CaptureQueriesContext(connection) as busy_delete:
+            self.client.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(len(busy_delete), len(empty_delete))
+
+    def test_members_get_a_tombstone(self):
+        self.delete()
+        results = self.client.get("/api/changes/", {"since": self.cursor}).data["results"]
+        self.assertEqual([(item["type"], item["action"], item["object"]) for item in results],
+                         [("project", "deleted", None)])
+
+    def test_purge_deletes_in_batches(self):
+        self.delete()
+        out = self.purge(batch_size=2)
+
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(project_id=self.project.pk).exists())
+        self.assertFalse(ProjectUserRole.all_objects.filter(project_id=self.project.pk).exists())
+        self.assertIn("deleted 2/~5 comments", out)
+        self.assertIn("deleted 5/~5 comments", out)
+        self.assertIn("deleted 2/~2 roles", out)
+        self.assertIn("Done: 1 projects purged.", out)
+
+        # Former members who missed the tombstone still learn of the removal of their role
+        results = self.client.get("/api/changes/", {"since": self.cursor}).data["results"]
+        self.assertEqual([(item["type"], item["action"], item["project"]) for item in results],
+                         [("role", "deleted", self.project.pk)])
+
+    def test_purge_is_resumable_and_leaves_live_projects(self):
+        live = Project.objects.create(name="Live", owner=self.owner)
+        Comment.objects.create(project=live, author=self.owner, text="Keep me")
+        self.delete()
+
+        with mock.patch("core.purge.purge_roles", side_effect=RuntimeError("interrupted")):
+            with self.assertRaises(RuntimeError):
+                self.purge(batch_size=2)
+        self.assertFalse(Comment.all_objects.filter(project_id=self.project.pk).exists())
+        self.assertTrue(Project.all_objects.filter(pk=self.project.pk).exists())
+
+        self.assertIn("Done: 1 projects purged.", self.purge())
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(Comment.objects.filter(project=live).count(), 1)
+        self.assertIn("Done: 0 projects purged.", self.purge())
+
+
+class TaskQueueTest(TestCase):
+    """Test the database-backed task queue and its run_tasks worker"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(name="Busy", owner=self.owner, member_count=1)
+        ProjectUserRole.objects.create(user=self.owner, project=self.project, role="owner")
+        self.client.force_authenticate(user=self.owner)
+
+    def run_tasks(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("run_tasks", once=True, processes=0, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_enqueued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            counters.refresh_later(self.project.pk)
+            self.assertFalse(Task.objects.exists())
+        for callback in callbacks:
+            callback()
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.key, task.status), ("core.counters.refresh", f"counters:{self.project.pk}", "queued"))
+
+    def test_writes_share_a_queued_task(self):
+        """Edits of one comment queue one reindex, which the worker runs once; counters do not wait for it"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/comments/", {"project": self.project.id, "text": "First draft"})
+        comment_id = response.data["id"]
+        for text in ("Second draft", "Final version"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f"/api/comments/{comment_id}/", {"text": text})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(Task.objects.values_list("name", "key")), [("core.search.reindex", f"search:comment:{comment_id}")])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.comment_count, 1)
+
+        out, _ = self.run_tasks()
+        self.assertIn("Done: 1 tasks succeeded, 0 failed.", out)
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(self.client.get("/api/search/", {"q": "final"}).data["results"][0]["object"]["id"], comment_id)
+
+    @override_settings(TASKS_MAX_ATTEMPTS=2, TASKS_BACKOFF_SECONDS=60)
+    def test_failures_are_retried_with_backoff(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue(failing_task, message="boom")
+
+        _, err = self.run_tasks()
+        self.assertIn("RuntimeError: boom", err)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), ("queued", 1))
+        self.assertGreater(task.run_at, datetime.now(dt_timezone.utc) + timedelta(seconds=50))
+        self.assertIn("boom", task.last_error)
+
+        # Not due yet, then due: the last attempt leaves it failed
+        self.run_tasks()
+        self.assertEqual(Task.objects.get().attempts, 1)
+        Task.objects.update(run_at=datetime.now(dt_timezone.utc))
+        self.run_tasks()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), ("failed", 2))
+
+    def test_expired_lease_is_run_again(self):
+        """A task left running by a worker that died runs again once its lease expires"""
+        Task.objects.create(name="core.counters.refresh", kwargs={"project_id": str(self.project.pk)},
+                            status="running", attempts=1,
+                            locked_until=datetime.now(dt_timezone.utc) - timedelta(seconds=1))
+        Task.objects.create(name="core.counters.refresh", kwargs={"project_id": str(self.project.pk)},
+                            status="running", attempts=1,
+                            locked_until=datetime.now(dt_timezone.utc) + timedelta(seconds=60))
+        out, _ = self.run_tasks()
+        self.assertIn("Done: 1 tasks succeeded, 0 failed.", out)
+        self.assertEqual(Task.objects.get().status, "running")
+
+    def test_only_tasks_run(self):
+        with self.assertRaises(ImproperlyConfigured):
+            tasks.enqueue(counters.refresh_later, project_id=self.project.pk)
+
+        Task.objects.create(name="core.counters.refresh_later", kwargs={"project_id": str(self.project.pk)})
+        _, err = self.run_tasks()
+        self.assertIn("is not a task", err)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        Project.objects.filter(pk=self.project.pk).update(member_count=7)
+        counters.refresh_later(self.project.pk)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.member_count, 1)
+        self.assertFalse(Task.objects.exists())
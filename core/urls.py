@@ -1,12 +1,27 @@
 from rest_framework import routers
 from django.urls import path, include
-from .views import ProjectViewSet, ProjectUserRoleViewSet, CommentViewSet
+from .views import ProjectViewSet, ProjectUserRoleViewSet, CommentViewSet, SearchView, ChangesView
+from . import async_views
 
 router = routers.DefaultRouter()
 router.register(r'projects', ProjectViewSet, basename='projects')
 router.register(r'roles', ProjectUserRoleViewSet, basename='roles')
 router.register(r'comments', CommentViewSet, basename='comments')
 
+# ASGI-native list, retrieve and create endpoints (see core.async_views)
+async_urlpatterns = [
+    path('projects/', async_views.ProjectListView.as_view(), name='async-projects-list'),
+    path('projects/<uuid:pk>/', async_views.ProjectDetailView.as_view(), name='async-projects-detail'),
+    path('projects/<uuid:pk>/events/', async_views.ProjectEventsView.as_view(), name='async-projects-events'),
+    path('comments/', async_views.CommentListView.as_view(), name='async-comments-list'),
+    path('comments/<uuid:pk>/', async_views.CommentDetailView.as_view(), name='async-comments-detail'),
+    path('roles/', async_views.RoleListView.as_view(), name='async-roles-list'),
+    path('roles/<uuid:pk>/', async_views.RoleDetailView.as_view(), name='async-roles-detail'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
+    path('search/', SearchView.as_view(), name='search'),
+    path('changes/', ChangesView.as_view(), name='changes'),
+    path('async/', include(async_urlpatterns)),
 ]
@@ -1,14 +1,33 @@
+import uuid
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError, PermissionDenied
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from accounts.models import CustomUser
 from .models import Project, Comment, ProjectUserRole
-from .serializers import ProjectSerializer, CommentSerializer, ProjectUserRoleSerializer
+from .serializers import ProjectSerializer, CommentSerializer, ProjectUserRoleSerializer, \
+    BulkRoleAssignmentSerializer, ProjectAccessSerializer, ProjectValuesSerializer, CommentValuesSerializer, ProjectUserRoleValuesSerializer
+from .mixins import ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin
 from .permissions import IsOwner, IsOwnerOrEditorOrReader
+from .roles import get_role_resolver, invalidate_user_roles
+from .renderers import CSVRenderer, NDJSONRenderer
+from . import changes, comment_io, counters, purge, search
 from constants import *
 from utils import custom_response
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
+    values_serializer_class = ProjectValuesSerializer
+    read_actions = ["access"]
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrEditorOrReader]
 
     def get_permissions(self):
@@ -18,25 +37,95 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     def get_queryset(self):
-        return Project.objects.filter(members__user=self.request.user).distinct()
+        user = self.request.user
+        return Project.objects.visible_to(user).with_role(user).select_related("owner")
+
+    def check_object_permissions(self, request, obj):
+        # The annotated role saves the permission check its own lookup
+        if getattr(obj, "my_role", None):
+            get_role_resolver(request).remember(obj.pk, obj.my_role)
+        super().check_object_permissions(request, obj)
 
     def perform_create(self, serializer):
         """Ensure only Owners and Editors can create projects."""
-        user_role = ProjectUserRole.objects.filter(user=self.request.user).first()
+        resolver = get_role_resolver(self.request)
 
-        if not user_role:
+        if not resolver.roles:
             raise PermissionDenied("You do not have permission to create a project.")
-        if user_role.role == "reader":
+        if not resolver.has_any_role("owner", "editor"):
             raise PermissionDenied("Readers cannot create projects.")
 
-        project = serializer.save(owner=self.request.user)
-        ProjectUserRole.objects.create(user=self.request.user, project=project, role="owner")
+        with transaction.atomic():
+            project = serializer.save(owner=self.request.user, member_count=1)
+            ProjectUserRole.objects.create(user=self.request.user, project=project, role="owner")
+        resolver.remember(project.pk, "owner")
+
+    def perform_destroy(self, instance):
+        """
+        Soft delete: the project is hidden at once, and its comments and roles
+        are deleted later by purge_deleted_projects, in batches.
+        """
+        purge.soft_delete(instance)
+        get_role_resolver(self.request).forget(instance.pk)
+
+    @action(detail=True, methods=["get"], url_path="comments/export",
+            renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export_comments(self, request, pk=None):
+        """
+        Stream every comment of the project, oldest first, as NDJSON (default)
+        or CSV (`?format=csv` or `Accept: text/csv`). Under ASGI the rows are
+        streamed through an async iterator.
+        """
+        project = self.get_object()
+        renderer = request.accepted_renderer
+        rows = comment_io.export_csv(project) if renderer.format == "csv" else comment_io.export_ndjson(project)
+        if isinstance(request._request, ASGIRequest):
+            rows = comment_io.aiter_export(rows)
+
+        response = StreamingHttpResponse(rows, content_type=renderer.media_type)
+        response["Content-Disposition"] = f'attachment; filename="comments-{project.pk}.{renderer.format}"'
+        return response
 
+    @action(detail=True, methods=["post"], url_path="comments/import")
+    def import_comments(self, request, pk=None):
+        """
+        Import comments from an NDJSON (`application/x-ndjson`) or CSV
+        (`text/csv`) body, one comment per record with a "text" field.
+        The comments are authored by the caller. Only Owners and Editors can import.
+        - A body that cannot be parsed past some record is a partial success:
+          the records before it are imported, and "stopped_at" says where the
+          import stopped. It is a 400 only when nothing was imported.
+        """
+        project = self.get_object()
+        fmt = "csv" if request.content_type.startswith(CSVRenderer.media_type) else "ndjson"
+        result = comment_io.import_comments(request.stream, project, request.user, fmt)
+        if result["stopped_at"] is None:
+            return custom_response(SUCCESS_COMMENTS_IMPORTED, result, status.HTTP_201_CREATED)
+        if not result["imported"]:
+            raise ParseError(ERROR_INVALID_IMPORT_FILE)
+        return custom_response(SUCCESS_COMMENTS_PARTIALLY_IMPORTED, result, status.HTTP_201_CREATED)
 
-class ProjectUserRoleViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["post"], url_path="access")
+    def access(self, request):
+        """
+        The caller's role in each of a batch of projects, `{"projects": [<uuid>, ...]}`.
+        - Answers {"roles": {<uuid>: role}}, null where the caller has no role
+          (or the project does not exist).
+        - Resolved through the role cache, then one IN query for the rest.
+        """
+        serializer = ProjectAccessSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project_ids = list(dict.fromkeys(serializer.validated_data["projects"]))
+        roles = get_role_resolver(request).roles_for(project_ids)
+        return Response({"roles": {str(project_id): roles[project_id] for project_id in project_ids}})
+
+
+class ProjectUserRoleViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = ProjectUserRole.objects.all()
     serializer_class = ProjectUserRoleSerializer
+    values_serializer_class = ProjectUserRoleValuesSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    cursor_ordering = ("id",)
 
     def get_permissions(self):
         """Only Owners can manage roles (create, update, delete)."""
@@ -44,6 +133,11 @@ class ProjectUserRoleViewSet(viewsets.ModelViewSet):
             return [IsOwner()]
         return super().get_permissions()
 
+    def get_serializer_class(self):
+        if self.action == "bulk":
+            return BulkRoleAssignmentSerializer
+        return super().get_serializer_class()
+
     def perform_create(self, serializer):
         project = serializer.validated_data["project"]
         user = serializer.validated_data["user"]
@@ -53,28 +147,224 @@ class ProjectUserRoleViewSet(viewsets.ModelViewSet):
             raise ValidationError(ERROR_USER_ALREADY_HAS_ROLE)
 
         # Only Owners can assign roles
-        if not project.members.filter(user=self.request.user, role="owner").exists():
+        if get_role_resolver(self.request).role_for(project.pk) != "owner":
             raise PermissionDenied(ERROR_UNAUTHORIZED_ROLE_ASSIGN)
 
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            counters.members_changed(project.pk, 1)
+
+    def perform_update(self, serializer):
+        previous_project_id = serializer.instance.project_id
+        with transaction.atomic():
+            role = serializer.save()
+            if role.project_id != previous_project_id:
+                counters.members_changed(previous_project_id, -1)
+                counters.members_changed(role.project_id, 1)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            counters.members_changed(instance.project_id, -1)
 
     def destroy(self, request, *args, **kwargs):
         """Only Owners can remove user roles from a project."""
         instance = self.get_object()
         self.perform_destroy(instance)
+        invalidate_user_roles(instance.user_id)
+        if instance.user_id == request.user.pk:
+            get_role_resolver(request).forget(instance.project_id)
         return custom_response(SUCCESS_ROLE_REMOVED, None, status.HTTP_204_NO_CONTENT)
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Assign roles in one project to many users.
+        - One owner check, one IN query for existing members and one for
+          unknown users, then a single bulk insert in one transaction.
+        - Every row gets a status: created, exists, duplicate or unknown_user.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project = serializer.validated_data["project"]
+        assignments = serializer.validated_data["roles"]
+
+        # Only Owners can assign roles
+        if get_role_resolver(request).role_for(project.pk) != "owner":
+            raise PermissionDenied(ERROR_UNAUTHORIZED_ROLE_ASSIGN)
+
+        user_ids = {assignment["user"] for assignment in assignments}
+        members = set(
+            ProjectUserRole.objects.filter(project=project, user_id__in=user_ids).values_list("user_id", flat=True)
+        )
+        known_users = set(CustomUser.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+
+        results, new_roles, seen = [], [], set()
+        for assignment in assignments:
+            user_id = assignment["user"]
+            if user_id not in known_users:
+                outcome = "unknown_user"
+            elif user_id in members:
+                outcome = "exists"
+            elif user_id in seen:
+                outcome = "duplicate"
+            else:
+                outcome = "created"
+                new_roles.append(ProjectUserRole(user_id=user_id, project=project, role=assignment["role"]))
+            seen.add(user_id)
+            results.append({"user": user_id, "role": assignment["role"], "status": outcome})
+
+        try:
+            with transaction.atomic():
+                ProjectUserRole.objects.bulk_create(new_roles, batch_size=500)
+                if new_roles:
+                    # bulk_create sends no post_save, so log the new roles here
+                    changes.record_many(changes.ROLE, changes.CREATED, new_roles)
+                    counters.members_changed(project.pk, len(new_roles))
+        except IntegrityError:
+            # Another request assigned one of these users in the meantime
+            raise ValidationError(ERROR_USER_ALREADY_HAS_ROLE)
+
+        # bulk_create sends no post_save, so invalidate the cached roles here
+        for role in new_roles:
+            invalidate_user_roles(role.user_id)
+
+        data = {"project": project.pk, "created": len(new_roles), "results": results}
+        status_code = status.HTTP_201_CREATED if new_roles else status.HTTP_200_OK
+        return custom_response(SUCCESS_ROLES_ASSIGNED, data, status_code)
+
+class CommentViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrEditorOrReader]
 
+    def get_queryset(self):
+        """
+        Only comments on the caller's projects, optionally narrowed to one
+        project with `?project=<uuid>`.
+        """
+        queryset = Comment.objects.visible_to(self.request.user).select_related("author", "project")
+
+        project_id = self.request.query_params.get("project")
+        if project_id:
+            try:
+                project_id = uuid.UUID(project_id)
+            except ValueError:
+                raise ValidationError({"project": ERROR_INVALID_PROJECT_FILTER})
+            queryset = queryset.filter(project_id=project_id)
+        return queryset
+
     def perform_create(self, serializer):
         """Ensure only Owners and Editors can create comments."""
         project = serializer.validated_data["project"]
-        user_role = project.members.filter(user=self.request.user).first()
+        user_role = get_role_resolver(self.request).role_for(project.pk)
 
-        if not user_role or user_role.role not in ["owner", "editor"]:
+        if user_role not in ["owner", "editor"]:
             raise PermissionDenied("You do not have permission to add comments.")
 
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            counters.comments_added(project.pk, last_comment_at=comment.created_at)
+
+    def perform_update(self, serializer):
+        previous_project_id = serializer.instance.project_id
+        with transaction.atomic():
+            comment = serializer.save()
+            if comment.project_id != previous_project_id:
+                counters.comments_removed(previous_project_id)
+                counters.comments_added(comment.project_id, last_comment_at=comment.created_at)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            counters.comments_removed(instance.project_id)
+
+
+def query_int(request, name, default, cutoff=None):
+    """A non-negative integer query parameter, or `default` when it is missing or invalid."""
+    try:
+        return _positive_int(request.query_params[name], cutoff=cutoff)
+    except (KeyError, ValueError):
+        return default
+
+
+class SearchView(ReplicaReadMixin, APIView):
+    """
+    Full-text search, `GET /api/search/?q=<terms>`:
+    - Matches project names and descriptions and comment texts, on the
+      caller's projects only.
+    - Results are ranked best first, `?limit=` per page with a `next` link.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 200
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": ERROR_SEARCH_QUERY_REQUIRED})
+        limit = query_int(request, "limit", api_settings.PAGE_SIZE or 50, cutoff=self.max_limit)
+        offset = query_int(request, "offset", 0)
+
+        hits = search.search(request.user, query, limit + 1, offset)
+        next_url = None
+        if len(hits) > limit:
+            next_url = replace_query_param(request.build_absolute_uri(), "offset", offset + limit)
+        return Response({"next": next_url, "results": self.results(hits[:limit])})
+
+    def results(self, hits):
+        """Attach each hit's object, serialized as in the project and comment lists."""
+        ids = {kind: [pk for hit_kind, pk, _ in hits if hit_kind == kind] for kind in (search.PROJECT, search.COMMENT)}
+        objects = {}
+        if ids[search.PROJECT]:
+            rows = Project.objects.with_role(self.request.user).filter(pk__in=ids[search.PROJECT])
+            for item in ProjectValuesSerializer.serialize(rows.values(*ProjectValuesSerializer.lookups())):
+                objects[search.PROJECT, item["id"]] = item
+        if ids[search.COMMENT]:
+            rows = Comment.objects.filter(pk__in=ids[search.COMMENT])
+            for item in CommentValuesSerializer.serialize(rows.values(*CommentValuesSerializer.lookups())):
+                objects[search.COMMENT, item["id"]] = item
+
+        return [
+            {"type": kind, "score": round(score, 6), "object": objects[kind, str(pk)]}
+            for kind, pk, score in hits if (kind, str(pk)) in objects
+        ]
+
+
+class ChangesView(ReplicaReadMixin, APIView):
+    """
+    Incremental changes feed, `GET /api/changes/?since=<cursor>`:
+    - Without `since`, returns no results and the current cursor: take a full
+      copy, then follow changes from there.
+    - With it, returns what changed after the cursor on the caller's projects,
+      oldest first, each change carrying the object as the lists show it.
+      Deletes come as tombstones (`"action": "deleted"`, `"object": null`).
+    - An object changed several times within a page appears once, at its last
+      change. `next` is set while more changes are waiting.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 1000
+
+    def get(self, request):
+        if "since" not in request.query_params:
+            return Response({"cursor": changes.latest_cursor(), "next": None, "results": []})
+        try:
+            since = _positive_int(request.query_params["since"])
+        except ValueError:
+            raise ValidationError({"since": ERROR_INVALID_CHANGES_CURSOR})
+        limit = query_int(request, "limit", api_settings.PAGE_SIZE or 50, cutoff=self.max_limit)
+
+        entries = changes.changes_for(request.user, since, limit + 1)
+        next_url = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), "since", entries[-1].id)
+        cursor = entries[-1].id if entries else since
+        return Response({"cursor": cursor, "next": next_url, "results": self.results(entries)})
+
+    def results(self, entries):
+        """The last entry of each object, with the object attached unless it was deleted."""
+        latest = {}
+        for entry in entries:
+            latest.pop((entry.kind, entry.object_id), None)
+            latest[entry.kind, entry.object_id] = entry
+        return changes.serialize(list(latest.values()), self.request.user)
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project_management_app.settings')
 
 application = get_asgi_application()
+
+# Hash passwords on a bounded pool so a burst of logins cannot take every CPU
+from django.conf import settings  # noqa: E402
+from accounts.hashers import enable_offload  # noqa: E402
+
+enable_offload(settings.PASSWORD_HASHING_WORKERS)
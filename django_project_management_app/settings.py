@@ -9,9 +9,13 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
+import os
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +62,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request metrics (see core.metrics), scraped from /metrics by these addresses only;
+# empty (the default) disables the endpoint. The check reads REMOTE_ADDR, so behind a
+# reverse proxy on the same host every request comes from 127.0.0.1: list the scraper's
+# address only where it reaches the app directly, not through the proxy.
+# Outside production, responses that repeat one SELECT METRICS_NPLUSONE_THRESHOLD
+# times carry an X-Query-Warning header.
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_NPLUSONE_HEADER = DEBUG
+METRICS_NPLUSONE_THRESHOLD = 5
+
 ROOT_URLCONF = 'django_project_management_app.urls'
 
 TEMPLATES = [
@@ -81,14 +96,170 @@ WSGI_APPLICATION = 'django_project_management_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DB_ENGINE selects the profile: 'sqlite' (default, single node) or 'postgres'.
+# Connections are kept for DB_CONN_MAX_AGE seconds and health-checked before reuse.
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+_database = {
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': _env_flag('DB_CONN_HEALTH_CHECKS', True),
+}
+
+if DB_ENGINE == 'postgres':
+    _database.update({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'project_management'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Required behind PgBouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': _env_flag('DB_DISABLE_SERVER_SIDE_CURSORS', False),
+        'OPTIONS': {},
+    })
+    if _env_flag('DB_POOL', False):
+        # psycopg's connection pool (psycopg[pool]) replaces persistent connections
+        _database['CONN_MAX_AGE'] = 0
+        _database['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    _database.update({
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL lets reads run alongside a write. IMMEDIATE transactions take the
+            # write lock up front, so concurrent writers wait up to `timeout` seconds
+            # for it instead of failing with "database is locked".
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+        },
+    })
+
+# Read replica
+# Safe requests to the core viewsets read from the replica when DB_REPLICA_NAME (sqlite)
+# or DB_REPLICA_HOST (postgres) is set; callers who just wrote stay on the primary for
+# REPLICA_STICKY_SECONDS. Otherwise 'replica' is another alias of the primary, used as
+# a test mirror.
+
+_replica = dict(_database, OPTIONS=dict(_database['OPTIONS']), TEST={'MIRROR': 'default'})
+if DB_ENGINE == 'postgres':
+    _replica['HOST'] = os.environ.get('DB_REPLICA_HOST', _database['HOST'])
+    _replica['PORT'] = os.environ.get('DB_REPLICA_PORT', _database['PORT'])
+    _replica_configured = 'DB_REPLICA_HOST' in os.environ
+else:
+    _replica['NAME'] = os.environ.get('DB_REPLICA_NAME', _database['NAME'])
+    _replica_configured = 'DB_REPLICA_NAME' in os.environ
+
 DATABASES = {
+    'default': _database,
+    'replica': _replica,
+}
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica' if _replica_configured else None
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_CACHE_ALIAS = 'roles'
+
+# The changes feed stops below a missing change log id, so a transaction that took
+# an earlier id but commits later is not skipped. A missing id counts as rolled back
+# once the entry after it is this old: keep it above the longest write transaction.
+# SQLite serializes writers, so ids commit in order and nothing is tracked.
+CHANGES_GAP_SECONDS = float(os.environ.get('CHANGES_GAP_SECONDS', 60 if DB_ENGINE == 'postgres' else 0))
+
+# Live project events (see core.events). With several worker processes, set
+# EVENTS_BROKER to core.events.ChangeLogBroker so every worker sees every write.
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'core.events.LocalBroker')
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1))
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_MAX_STREAM_SECONDS = 300
+
+# Background tasks (see core.tasks), run by `python manage.py run_tasks`. With
+# TASKS_EAGER, tasks run inline when enqueued, without a worker.
+TASKS_EAGER = _env_flag('TASKS_EAGER', False)
+TASKS_MAX_ATTEMPTS = int(os.environ.get('TASKS_MAX_ATTEMPTS', 5))
+TASKS_BACKOFF_SECONDS = float(os.environ.get('TASKS_BACKOFF_SECONDS', 10))
+TASKS_LEASE_SECONDS = int(os.environ.get('TASKS_LEASE_SECONDS', 300))
+TASKS_POLL_INTERVAL = float(os.environ.get('TASKS_POLL_INTERVAL', 1))
+
+AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Role checks are served from the 'roles' cache. It is per-process locmem
+# unless ROLE_CACHE_URL points at a Redis-compatible server shared by workers.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'roles': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'roles',
+    },
+}
+
+if os.environ.get('ROLE_CACHE_URL'):
+    CACHES['roles'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['ROLE_CACHE_URL'],
     }
+
+ROLE_CACHE_ALIAS = 'roles'
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', 300))
+
+# Token versions (see accounts.authentication) share the cross-worker 'roles' cache
+TOKEN_VERSION_CACHE_ALIAS = 'roles'
+TOKEN_VERSION_CACHE_TIMEOUT = int(os.environ.get('TOKEN_VERSION_CACHE_TIMEOUT', 300))
+# Refresh tokens are checked against an in-memory blacklist (accounts.blacklist),
+# re-synced at least this often (seconds) even without a shared cache
+TOKEN_BLACKLIST_SYNC_INTERVAL = int(os.environ.get('TOKEN_BLACKLIST_SYNC_INTERVAL', 10))
+
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new hashes (argon2, scrypt or pbkdf2); the
+# others stay listed so existing hashes still verify. Costs are tuned per environment
+# and passwords are re-hashed on login when they change. Argon2 needs argon2-cffi;
+# a hasher that is unknown or not installed is a configuration error.
+
+PASSWORD_HASHING = {
+    'PBKDF2_ITERATIONS': int(os.environ.get('PBKDF2_ITERATIONS', 1_000_000)),
+    'SCRYPT_WORK_FACTOR': int(os.environ.get('SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'SCRYPT_BLOCK_SIZE': int(os.environ.get('SCRYPT_BLOCK_SIZE', 8)),
+    'SCRYPT_PARALLELISM': int(os.environ.get('SCRYPT_PARALLELISM', 5)),
+    'SCRYPT_MAXMEM': int(os.environ.get('SCRYPT_MAXMEM', 0)),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 102400)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 8)),
 }
 
-AUTH_USER_MODEL = 'accounts.CustomUser'
+_PASSWORD_HASHERS = {
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+}
+if find_spec('argon2') is None:
+    del _PASSWORD_HASHERS['argon2']
+
+_preferred_hasher = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if _preferred_hasher not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASHER={_preferred_hasher!r} is not available; use one of: {', '.join(_PASSWORD_HASHERS)}"
+        + (" (argon2 needs argon2-cffi)." if _preferred_hasher == 'argon2' else ".")
+    )
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[_preferred_hasher]]
+PASSWORD_HASHERS += [path for path in _PASSWORD_HASHERS.values() if path not in PASSWORD_HASHERS]
+
+# Concurrent hashes when serving over ASGI (see accounts.hashers)
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -133,10 +304,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'accounts.authentication.ClaimsJWTAuthentication',
+    ),
+    # orjson is used for JSON when installed, the stdlib otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.VersionedTokenRefreshSerializer',
 }
 
+# List endpoints serialize straight from .values() rows (see core.mixins.ValuesListMixin)
+FAST_LIST_SERIALIZATION = True
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {